@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import defaultdict
+
+import httpx
+
+CSRF = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+class Recorder:
+    # per-route samples for one concurrency level; requests started after the deadline
+    # (users finishing a page loop) are dropped, and throughput is over the fixed window
+    def __init__(self, deadline, duration):
+        self.deadline = deadline
+        self.duration = duration
+        self.samples = defaultdict(list)
+        self.first_byte = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, route, started, status, elapsed, ttfb=None):
+        if started >= self.deadline:
+            return
+        self.statuses[route][status] += 1
+        if status is None or status >= 400:
+            self.errors[route] += 1
+            return
+        self.samples[route].append(elapsed)
+        if ttfb is not None:
+            self.first_byte[route].append(ttfb)
+
+    def summary(self):
+        out = {}
+        for route in sorted(self.statuses):
+            ms = [s * 1000 for s in self.samples[route]]
+            row = {
+                "requests": sum(self.statuses[route].values()),
+                "errors": self.errors[route],
+                "throughput_rps": len(ms) / self.duration if self.duration else 0.0,
+                "p50_ms": percentile(ms, 50),
+                "p95_ms": percentile(ms, 95),
+                "p99_ms": percentile(ms, 99),
+                "statuses": {str(k): v for k, v in self.statuses[route].items()},
+            }
+            if self.first_byte[route]:
+                ttfb = [s * 1000 for s in self.first_byte[route]]
+                row.update({"ttfb_p50_ms": percentile(ttfb, 50), "ttfb_p95_ms": percentile(ttfb, 95)})
+            out[route] = row
+        return out
+
+
+async def timed(recorder, route, client, method, url, stream=False, **kwargs):
+    # streams are read to the end; TTFB is the first body chunk
+    started = time.monotonic()
+    began = time.perf_counter()
+    try:
+        if not stream:
+            response = await client.request(method, url, **kwargs)
+            recorder.add(route, started, response.status_code, time.perf_counter() - began)
+            return response
+        ttfb = None
+        async with client.stream(method, url, **kwargs) as response:
+            async for chunk in response.aiter_bytes():
+                if chunk and ttfb is None:
+                    ttfb = time.perf_counter() - began
+        recorder.add(route, started, response.status_code, time.perf_counter() - began, ttfb)
+        return response
+    except httpx.HTTPError:
+        recorder.add(route, started, None, time.perf_counter() - began)
+        return None
+
+
+async def login(client, app_url, email, password, register=False):
+    async def submit(path, data):
+        page = await client.get(f"{app_url}{path}")
+        match = CSRF.search(page.text)
+        data = {**data, "csrf_token": match.group(1)} if match else data
+        return await client.post(f"{app_url}{path}", data=data)
+
+    if register:
+        await submit("/register", {"email": email, "password": password, "confirm_password": password})
+    response = await submit("/login", {"email": email, "password": password})
+    # a successful login redirects away from /login
+    if response.status_code != 302 or "/login" in response.headers.get("location", ""):
+        raise RuntimeError(f"login failed for {email}")
+
+
+class User:
+    # one simulated visitor: lands on the index, scrolls and searches, opens modals
+    # (JSON + /ask streamed straight from the RAG API, like index.html) and now and
+    # then a detail page whose entry streams through Flask
+    def __init__(self, client, args, recorder, rng):
+        self.client = client
+        self.args = args
+        self.recorder = recorder
+        self.rng = rng
+        self.seen = {}
+
+    async def think(self):
+        if self.args.think > 0:
+            await asyncio.sleep(self.rng.expovariate(1 / self.args.think))
+
+    async def get(self, route, path, stream=False, **kwargs):
+        return await timed(self.recorder, route, self.client, "GET", f"{self.args.app_url}{path}", stream, **kwargs)
+
+    async def browse(self, per_page=60):
+        await self.get("GET /", "/")
+        for page in range(1, self.rng.randint(1, self.args.max_pages) + 1):
+            params = {"page": page, "per_page": per_page}
+            if page == 1 and self.rng.random() < self.args.search_share:
+                params["q"] = self.rng.choice(list(self.seen.values()) or ["pi"])[:3].lower()
+            response = await self.get("GET /api/pokemon", "/api/pokemon", params=params)
+            if response is not None and response.status_code == 200:
+                self.seen.update({p["id"]: p["name"] for p in response.json()["items"]})
+            await self.think()
+
+    def pick(self):
+        if self.seen and self.rng.random() < 0.8:
+            return self.rng.choice(list(self.seen))
+        return self.rng.randint(1, self.args.max_id)
+
+    async def open_modal(self):
+        pokemon_id = self.pick()
+        response = await self.get("GET /pokemon/<id>/json", f"/pokemon/{pokemon_id}/json")
+        if response is None or response.status_code != 200:
+            return
+        if self.args.rag_url and self.rng.random() < self.args.ask_share:
+            await timed(
+                self.recorder, "POST /ask (rag)", self.client, "POST", f"{self.args.rag_url}/ask",
+                stream=True, json={"question": response.json()["name"]}
+            )
+
+    async def open_detail(self):
+        pokemon_id = self.pick()
+        response = await self.get("GET /pokemon/<id>", f"/pokemon/{pokemon_id}")
+        if response is not None and response.status_code == 200:
+            await self.get("GET /pokemon/<id>/entry", f"/pokemon/{pokemon_id}/entry", stream=True)
+
+    async def run(self, deadline):
+        while time.monotonic() < deadline:
+            await self.browse()
+            for _ in range(self.rng.randint(1, self.args.max_modals)):
+                if time.monotonic() >= deadline:
+                    return
+                await self.open_modal()
+                await self.think()
+            if self.rng.random() < self.args.detail_share and time.monotonic() < deadline:
+                await self.open_detail()
+                await self.think()
+
+
+async def run_level(args, concurrency, seed):
+    limits = httpx.Limits(max_connections=8, max_keepalive_connections=8)
+    clients = [httpx.AsyncClient(timeout=args.timeout, limits=limits) for _ in range(concurrency)]
+    try:
+        # every simulated user logs in once, outside the measured window
+        await asyncio.gather(*(login(c, args.app_url, args.email, args.password) for c in clients))
+        deadline = time.monotonic() + args.duration
+        recorder = Recorder(deadline, args.duration)
+        users = [User(c, args, recorder, random.Random(seed + i)) for i, c in enumerate(clients)]
+        await asyncio.gather(*(u.run(deadline) for u in users))
+    finally:
+        await asyncio.gather(*(c.aclose() for c in clients))
+    return recorder.summary()
+
+
+def saturation(levels):
+    # per route: the level after which throughput stops growing (< 10% more) while p95 keeps rising
+    out = {}
+    routes = {route for summary in levels.values() for route in summary}
+    for route in sorted(routes):
+        points = [(c, s[route]) for c, s in levels.items() if route in s]
+        knee = None
+        for (c, prev), (_, cur) in zip(points, points[1:]):
+            if cur["throughput_rps"] < prev["throughput_rps"] * 1.1 and cur["p95_ms"] > prev["p95_ms"]:
+                knee = c
+                break
+        out[route] = {
+            "concurrency": knee,
+            "peak_rps": max(s["throughput_rps"] for _, s in points),
+        }
+    return out
+
+
+def print_level(concurrency, summary):
+    print(f"\nconcurrency {concurrency}")
+    print(f"  {'route':<28}{'reqs':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttfb p50':>10}")
+    for route, r in summary.items():
+        ttfb = f"{r['ttfb_p50_ms']:.0f}" if "ttfb_p50_ms" in r else "-"
+        print(
+            f"  {route:<28}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>9.1f}"
+            f"{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['p99_ms']:>10.0f}{ttfb:>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated users against the Flask app and RAG API at rising concurrency.")
+    parser.add_argument("--app-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--rag-url", default="http://127.0.0.1:8000", help="Empty to skip direct /ask streams.")
+    parser.add_argument("--email", default="loadtest@example.com")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--register", action="store_true", help="Create the account (or reset its password) first.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per concurrency level.")
+    parser.add_argument("--think", type=float, default=0.5, help="Mean think time between actions, seconds.")
+    parser.add_argument("--max-pages", type=int, default=3, help="Pages scrolled per visit.")
+    parser.add_argument("--max-modals", type=int, default=3, help="Modals opened per visit.")
+    parser.add_argument("--search-share", type=float, default=0.2)
+    parser.add_argument("--ask-share", type=float, default=0.5, help="Share of modal opens that stream /ask.")
+    parser.add_argument("--detail-share", type=float, default=0.2, help="Share of visits that open a detail page.")
+    parser.add_argument("--max-id", type=int, default=386)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the results as JSON here.")
+    args = parser.parse_args()
+    args.app_url, args.rag_url = args.app_url.rstrip("/"), args.rag_url.rstrip("/")
+
+    if args.register:
+        async def register():
+            async with httpx.AsyncClient(timeout=args.timeout) as client:
+                await login(client, args.app_url, args.email, args.password, register=True)
+        asyncio.run(register())
+
+    levels = {}
+    for concurrency in args.concurrency:
+        print(f"driver: {concurrency} users for {args.duration:.0f}s")
+        levels[concurrency] = asyncio.run(run_level(args, concurrency, args.seed))
+        print_level(concurrency, levels[concurrency])
+
+    knees = saturation(levels)
+    print("\nsaturation")
+    for route, knee in knees.items():
+        where = f"~{knee['concurrency']} users" if knee["concurrency"] else "not reached"
+        print(f"  {route:<28}{where:>16}   peak {knee['peak_rps']:.1f} rps")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"args": vars(args), "levels": levels, "saturation": knees}, f, indent=2)
+        print(f"driver: results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
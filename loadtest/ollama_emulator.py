@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# reuse the offline stand-ins from the RAG service: the same hashed vectors as
+# EMBEDDING_BACKEND=fake (so an index built offline still retrieves sensibly) and
+# the same pseudo-answers as LLM_BACKEND=fake
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pokedex"))
+from embeddings import FakeEmbeddings  # noqa: E402
+from fake_llm import FakeLLM  # noqa: E402
+
+
+def settings_from_env():
+    return {
+        "ttft": float(os.getenv("EMULATOR_TTFT", 0.3)),
+        "tokens_per_sec": float(os.getenv("EMULATOR_TOKENS_PER_SEC", 30)),
+        "max_tokens": int(os.getenv("EMULATOR_MAX_TOKENS", 200)),
+        # generations served at once, like OLLAMA_NUM_PARALLEL; the rest queue
+        "parallel": int(os.getenv("EMULATOR_PARALLEL", 4)),
+        "embed_latency": float(os.getenv("EMULATOR_EMBED_LATENCY", 0.02)),
+        "embed_per_text": float(os.getenv("EMULATOR_EMBED_PER_TEXT", 0.005)),
+        # first use of a model costs this much, like loading it into VRAM
+        "load_time": float(os.getenv("EMULATOR_LOAD_TIME", 0)),
+        "dim": int(os.getenv("EMULATOR_DIM", 256)),
+    }
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def build_app(settings):
+    # the subset of the Ollama HTTP API that ollama-python / langchain_ollama use
+    app = FastAPI()
+    slots = asyncio.Semaphore(settings["parallel"])
+    embedder = FakeEmbeddings(size=settings["dim"])
+    llm = FakeLLM(max_tokens=settings["max_tokens"])
+    loaded = {}
+    stats = {"generating": 0, "queued": 0, "generations": 0, "tokens": 0, "embeddings": 0}
+
+    async def ensure_loaded(model):
+        if model not in loaded:
+            await asyncio.sleep(settings["load_time"])
+            loaded[model] = now()
+
+    async def generate_tokens(model, prompt):
+        # holds a slot for the whole generation; waiting for one counts as queued
+        stats["queued"] += 1
+        try:
+            await slots.acquire()
+        finally:
+            stats["queued"] -= 1
+        stats["generating"] += 1
+        try:
+            await ensure_loaded(model)
+            if not prompt:
+                # an empty prompt only loads the model (warm-up)
+                return
+            await asyncio.sleep(settings["ttft"])
+            for token in llm._tokens(prompt):
+                await asyncio.sleep(1.0 / settings["tokens_per_sec"])
+                stats["tokens"] += 1
+                yield token
+            stats["generations"] += 1
+        finally:
+            stats["generating"] -= 1
+            slots.release()
+
+    def final(model, prompt, began, count, text=""):
+        elapsed = time.perf_counter_ns() - began
+        return {
+            "model": model, "created_at": now(), "response": text, "done": True,
+            "done_reason": "stop" if prompt else "load", "context": [],
+            "total_duration": elapsed, "load_duration": 0,
+            "prompt_eval_count": len(prompt.split()), "prompt_eval_duration": 0,
+            "eval_count": count, "eval_duration": elapsed,
+        }
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        model, prompt = body.get("model", ""), body.get("prompt", "")
+        began = time.perf_counter_ns()
+
+        if not body.get("stream", True):
+            tokens = [t async for t in generate_tokens(model, prompt)]
+            return final(model, prompt, began, len(tokens), "".join(tokens))
+
+        async def stream():
+            count = 0
+            async for token in generate_tokens(model, prompt):
+                count += 1
+                yield json.dumps({"model": model, "created_at": now(), "response": token, "done": False}) + "\n"
+            yield json.dumps(final(model, prompt, began, count)) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        model, inputs = body.get("model", ""), body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        began = time.perf_counter_ns()
+        await ensure_loaded(model)
+        await asyncio.sleep(settings["embed_latency"] + settings["embed_per_text"] * len(inputs))
+        stats["embeddings"] += len(inputs)
+        return {
+            "model": model,
+            "embeddings": embedder.embed_documents(inputs),
+            "total_duration": time.perf_counter_ns() - began,
+            "load_duration": 0,
+            "prompt_eval_count": sum(len(t.split()) for t in inputs),
+        }
+
+    @app.post("/api/embeddings")
+    async def embeddings_legacy(request: Request):
+        body = await request.json()
+        await ensure_loaded(body.get("model", ""))
+        await asyncio.sleep(settings["embed_latency"] + settings["embed_per_text"])
+        stats["embeddings"] += 1
+        return {"embedding": embedder.embed_query(body.get("prompt", ""))}
+
+    @app.get("/api/tags")
+    def tags():
+        return {"models": [
+            {"name": m, "model": m, "modified_at": at, "size": 0, "digest": "", "details": {}}
+            for m, at in loaded.items()
+        ]}
+
+    @app.get("/api/ps")
+    def ps():
+        return {"models": [{"name": m, "model": m, "size": 0, "digest": "", "expires_at": None} for m in loaded]}
+
+    @app.post("/api/show")
+    async def show(request: Request):
+        body = await request.json()
+        if body.get("model", body.get("name")) not in loaded:
+            return JSONResponse({"error": "model not found"}, status_code=404)
+        return {"modelfile": "", "parameters": "", "template": "{{ .Prompt }}", "details": {}}
+
+    @app.get("/api/version")
+    def version():
+        return {"version": "0.0.0-emulator"}
+
+    @app.get("/emulator/stats")
+    def emulator_stats():
+        return {**stats, "settings": settings}
+
+    return app
+
+
+# `uvicorn ollama_emulator:app` from this directory uses the EMULATOR_* env settings
+app = build_app(settings_from_env())
+
+
+def main():
+    defaults = settings_from_env()
+    parser = argparse.ArgumentParser(description="Ollama-compatible generate/embed stand-in with configurable latency.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft", type=float, default=defaults["ttft"], help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-sec", type=float, default=defaults["tokens_per_sec"])
+    parser.add_argument("--max-tokens", type=int, default=defaults["max_tokens"])
+    parser.add_argument("--parallel", type=int, default=defaults["parallel"], help="Generations served at once.")
+    parser.add_argument("--embed-latency", type=float, default=defaults["embed_latency"], help="Seconds per embed call.")
+    parser.add_argument("--embed-per-text", type=float, default=defaults["embed_per_text"], help="Extra seconds per input.")
+    parser.add_argument("--load-time", type=float, default=defaults["load_time"], help="Seconds for a model's first use.")
+    parser.add_argument("--dim", type=int, default=defaults["dim"], help="Embedding size.")
+    args = parser.parse_args()
+
+    import uvicorn
+    settings = {key: getattr(args, key) for key in defaults}
+    print(f"ollama emulator on http://{args.host}:{args.port} {settings}")
+    uvicorn.run(build_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
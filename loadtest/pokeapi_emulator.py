@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+FIXTURE_DIR = os.getenv(
+    "POKEAPI_FIXTURES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pokeapi")
+)
+POKEAPI_URL = "https://pokeapi.co/api/v2"
+SPRITE_URL = "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/{id}.png"
+# what poke_app (format_pokemon) and pokemon_scrape.py read; recordings keep only these
+FIELDS = ("id", "name", "height", "weight", "sprites", "abilities", "types", "moves", "stats")
+
+
+def trim(data):
+    out = {key: data[key] for key in FIELDS if key in data}
+    out["sprites"] = {"front_default": data.get("sprites", {}).get("front_default")}
+    out["moves"] = [{"move": m["move"]} for m in data.get("moves", [])]
+    return out
+
+
+def save_fixture(directory, data):
+    with open(os.path.join(directory, f"{data['id']}.json"), "w") as f:
+        json.dump(data, f)
+
+
+def record(directory, ids, workers=8, full=False):
+    # snapshot real PokéAPI responses once; serve them offline afterwards
+    import requests
+
+    os.makedirs(directory, exist_ok=True)
+    session = requests.Session()
+
+    def fetch(pokemon_id):
+        try:
+            res = session.get(f"{POKEAPI_URL}/pokemon/{pokemon_id}", timeout=30)
+            res.raise_for_status()
+            return pokemon_id, res.json()
+        except requests.RequestException as e:
+            print(f"record: #{pokemon_id} failed: {e}")
+            return pokemon_id, None
+
+    stored = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _, data in pool.map(fetch, ids):
+            if data is not None:
+                save_fixture(directory, data if full else trim(data))
+                stored += 1
+    print(f"record: {stored} fixtures written to {directory}")
+
+
+def synthesize(directory, rows_path):
+    # PokéAPI-shaped fixtures from a rows dump (`python bench.py dump-rows`), no network needed
+    os.makedirs(directory, exist_ok=True)
+    with open(rows_path) as f:
+        rows = json.load(f)
+    for row in rows:
+        stats = json.loads(row["base_stats"]) if isinstance(row["base_stats"], str) else row["base_stats"]
+        if isinstance(stats, dict):
+            stats = [{"base_stat": v, "stat": {"name": k}} for k, v in stats.items()]
+        save_fixture(directory, {
+            "id": int(row["id"]),
+            "name": row["name"].lower(),
+            "height": row["height"],
+            "weight": row["weight"],
+            "sprites": {"front_default": SPRITE_URL.format(id=row["id"])},
+            "abilities": [{"ability": {"name": a}} for a in json.loads(row["abilities"])],
+            "types": [{"slot": i + 1, "type": {"name": t.lower()}} for i, t in enumerate(json.loads(row["types"]))],
+            "moves": [{"move": {"name": m}} for m in json.loads(row["moves"])],
+            "stats": stats,
+        })
+    print(f"synthesize: {len(rows)} fixtures written to {directory}")
+
+
+def load_fixtures(directory):
+    # id and name -> (body, etag); bodies are served as stored, byte for byte
+    fixtures = {}
+    for name in os.listdir(directory) if os.path.isdir(directory) else ():
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), "rb") as f:
+            body = f.read()
+        data = json.loads(body)
+        entry = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        fixtures[str(data["id"])] = entry
+        fixtures[data["name"]] = entry
+    return fixtures
+
+
+def build_app(directory, latency=0.0, jitter=0.0, error_rate=0.0):
+    # GET /api/v2/pokemon/{id or name} with ETag / If-None-Match, plus the paged list
+    app = FastAPI()
+    fixtures = load_fixtures(directory)
+    names = {int(key): json.loads(body)["name"] for key, (body, _) in fixtures.items() if key.isdigit()}
+    ids = sorted(names)
+    app.state.fixtures = len(ids)
+
+    async def delay():
+        wait = latency + random.uniform(0, jitter)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @app.get("/api/v2/pokemon/{key}")
+    async def pokemon(key: str, request: Request):
+        await delay()
+        if error_rate and random.random() < error_rate:
+            return JSONResponse({"detail": "injected failure"}, status_code=503)
+        entry = fixtures.get(key.lower().strip("/"))
+        if entry is None:
+            return Response("Not Found", status_code=404, media_type="text/plain")
+        body, etag = entry
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type="application/json", headers={"ETag": etag})
+
+    @app.get("/api/v2/pokemon")
+    async def pokemon_list(request: Request, limit: int = 20, offset: int = 0):
+        await delay()
+        base = str(request.base_url).rstrip("/")
+        page = ids[offset:offset + limit]
+        return {
+            "count": len(ids),
+            "next": f"{base}/api/v2/pokemon?offset={offset + limit}&limit={limit}" if offset + limit < len(ids) else None,
+            "previous": None,
+            "results": [
+                {"name": names[i], "url": f"{base}/api/v2/pokemon/{i}/"}
+                for i in page
+            ],
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PokéAPI stand-in serving recorded /api/v2/pokemon fixtures.")
+    parser.add_argument("--dir", default=FIXTURE_DIR, help="Fixture directory (one <id>.json per Pokémon).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8100)
+    serve.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response.")
+    serve.add_argument("--jitter", type=float, default=0.02, help="Up to this many extra random seconds.")
+    serve.add_argument("--error-rate", type=float, default=0.0, help="Share of lookups answered with 503.")
+
+    rec = sub.add_parser("record")
+    rec.add_argument("--start", type=int, default=1)
+    rec.add_argument("--end", type=int, default=386)
+    rec.add_argument("--workers", type=int, default=8)
+    rec.add_argument("--full", action="store_true", help="Keep whole payloads instead of the fields the apps read.")
+
+    syn = sub.add_parser("synthesize")
+    syn.add_argument("--rows", required=True, help="Rows JSON from `python bench.py dump-rows`.")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.dir, list(range(args.start, args.end + 1)), args.workers, args.full)
+    elif args.command == "synthesize":
+        synthesize(args.dir, args.rows)
+    else:
+        import uvicorn
+        app = build_app(args.dir, args.latency, args.jitter, args.error_rate)
+        print(f"pokeapi emulator on http://{args.host}:{args.port}/api/v2 ({app.state.fixtures} fixtures)")
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""add pokemon.updated_at for resumable ingest
+
+Revision ID: 3b9f0c2d6a41
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9f0c2d6a41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # databases created by `flask init-db` after this change already have the column
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('pokemon')}
+    if 'updated_at' not in columns:
+        with op.batch_alter_table('pokemon', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('pokemon', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
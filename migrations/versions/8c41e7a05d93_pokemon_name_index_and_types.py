@@ -0,0 +1,55 @@
+"""index pokemon.name and add the normalized pokemon_type table
+
+Revision ID: 8c41e7a05d93
+Revises: 3b9f0c2d6a41
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e7a05d93'
+down_revision = '3b9f0c2d6a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # each step is skipped if `flask init-db` already created it from the models
+    inspector = sa.inspect(op.get_bind())
+    if 'ix_pokemon_name' not in {i['name'] for i in inspector.get_indexes('pokemon')}:
+        with op.batch_alter_table('pokemon', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_pokemon_name'), ['name'], unique=False)
+
+    if not inspector.has_table('pokemon_type'):
+        op.create_table(
+            'pokemon_type',
+            sa.Column('pokemon_id', sa.Integer(), nullable=False),
+            sa.Column('type', sa.String(length=20), nullable=False),
+            sa.ForeignKeyConstraint(['pokemon_id'], ['pokemon.id'], ),
+            sa.PrimaryKeyConstraint('pokemon_id', 'type')
+        )
+        with op.batch_alter_table('pokemon_type', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_pokemon_type_type'), ['type'], unique=False)
+
+        # backfill from Pokemon.types, as `flask sync-pokemon-types` does
+        pokemon = sa.table('pokemon', sa.column('id', sa.Integer), sa.column('types', sa.String))
+        pokemon_type = sa.table('pokemon_type', sa.column('pokemon_id', sa.Integer), sa.column('type', sa.String))
+        rows = [
+            {'pokemon_id': pid, 'type': t.strip()}
+            for pid, types in op.get_bind().execute(sa.select(pokemon.c.id, pokemon.c.types))
+            for t in (types or '').split(',') if t.strip()
+        ]
+        if rows:
+            op.bulk_insert(pokemon_type, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('pokemon_type', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pokemon_type_type'))
+
+    op.drop_table('pokemon_type')
+    with op.batch_alter_table('pokemon', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pokemon_name'))
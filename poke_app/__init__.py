@@ -14,8 +14,6 @@ from dotenv import load_dotenv
 from .extensions import db
 from .models import User, OAuth
 from .config import Config
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
 
 load_dotenv()
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
@@ -37,6 +35,8 @@ def create_app():
     app.config.from_object(Config)
     # Init extensions
     db.init_app(app)              
+    from .sessions import configure_session_backend
+    configure_session_backend(app)
     Session(app)
     migrate = Migrate(app, db)
     csrf.init_app(app)
@@ -49,29 +49,38 @@ def create_app():
     # Initialize the database
     app.config['SQLALCHEMY_DATABASE_URI'] = Config.SQLALCHEMY_DATABASE_URI
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = Config.SQLALCHEMY_TRACK_MODIFICATIONS
-    app.config['SESSION_TYPE'] = 'filesystem'
     
 
     from .models import User
-    create_database(app)
+    # production workers skip this; run `flask init-db` as a deploy step instead
+    if app.config['AUTO_CREATE_TABLES']:
+        create_database(app)
 
     login_manager = LoginManager()
     login_manager.login_view = "auth.login"
     login_manager.init_app(app)
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    # cached: most requests no longer hit MySQL just to load current_user
+    from .identity import load_user
+    login_manager.user_loader(load_user)
     
     #Load our routes
     from .views import views
     from .auth import auth
+    from .assets import assets, sheet_css_url, sprite_class, sprite_url
 
     app.register_blueprint(views, url_prefix='/')
     app.register_blueprint(auth, url_prefix='/')
     app.register_blueprint(google_bp, url_prefix="/login")
-    # Print URL map to debug routes
-    print(app.url_map)
+    app.register_blueprint(assets)
+    app.jinja_env.globals.update(sprite_url=sprite_url, sprite_class=sprite_class, sheet_css_url=sheet_css_url)
+
+    from .cli import register_commands
+    register_commands(app)
+    from .tracing import init_tracing
+    init_tracing(app)
+    # URL map only when debugging routes
+    app.logger.debug(app.url_map)
 
     return app
 
@@ -80,4 +89,4 @@ def create_app():
 def create_database(app):
     with app.app_context():
         db.create_all()
-    print('Ensured all tables are created.')
\ No newline at end of file
+    app.logger.info('Ensured all tables are created.')
\ No newline at end of file
@@ -0,0 +1,191 @@
+import copy
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Blueprint, abort, current_app, send_from_directory, url_for
+
+from .listing import SPRITE_URL
+from .pokeapi_cache import CRY_URL, _session
+
+# content-addressed objects: <sha256>.<ext>, so every URL can be cached forever
+OBJECT_NAME = re.compile(r"^[0-9a-f]{64}\.(png|ogg|css|json)$")
+SOURCES = {"sprites": (SPRITE_URL, "png"), "cries": (CRY_URL, "ogg")}
+
+assets = Blueprint("assets", __name__)
+
+_manifest = {"mtime": None, "data": None}
+_manifest_lock = threading.Lock()
+
+
+def objects_dir():
+    return os.path.join(current_app.config['ASSET_DIR'], 'objects')
+
+
+def manifest_path():
+    return os.path.join(current_app.config['ASSET_DIR'], 'manifest.json')
+
+
+def empty_manifest():
+    return {"sprites": {}, "cries": {}, "sheets": None}
+
+
+def load_manifest():
+    # re-read only when a sync/build has replaced the file
+    path = manifest_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return empty_manifest()
+    with _manifest_lock:
+        if _manifest["mtime"] != mtime:
+            with open(path) as f:
+                _manifest["data"] = json.load(f)
+            _manifest["mtime"] = mtime
+        return _manifest["data"]
+
+
+def manifest_version():
+    # part of page cache keys/ETags so pages pick up new sheets
+    load_manifest()
+    return _manifest["mtime"] or 0
+
+
+def save_manifest(data):
+    path = manifest_path()
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def put_object(content, ext):
+    name = f"{hashlib.sha256(content).hexdigest()}.{ext}"
+    path = os.path.join(objects_dir(), name)
+    if not os.path.exists(path):
+        with open(path + ".tmp", "wb") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+    return name
+
+
+def object_url(name):
+    return url_for('assets.serve_asset', name=name)
+
+
+def sprite_url(pokemon_id):
+    name = load_manifest()["sprites"].get(str(pokemon_id))
+    return object_url(name) if name else SPRITE_URL.format(id=pokemon_id)
+
+
+def cry_url(pokemon_id):
+    name = load_manifest()["cries"].get(str(pokemon_id))
+    return object_url(name) if name else CRY_URL.format(id=pokemon_id)
+
+
+def sheet_css_url():
+    sheets = load_manifest()["sheets"]
+    return object_url(sheets["css"]) if sheets else None
+
+
+def sprite_class(pokemon_id):
+    # CSS class of the card sprite inside a sheet, or None to fall back to <img>
+    sheets = load_manifest()["sheets"]
+    if sheets and str(pokemon_id) in sheets["ids"]:
+        return f"sprite sprite-{pokemon_id}"
+    return None
+
+
+def localize(pokemon):
+    # PokéAPI payloads point at GitHub; swap in the mirrored copies when present
+    return {**pokemon, 'sprite': sprite_url(pokemon['id']), 'cry_url': cry_url(pokemon['id'])}
+
+
+@assets.route('/assets/<name>')
+def serve_asset(name):
+    if not OBJECT_NAME.match(name):
+        abort(404)
+    response = send_from_directory(objects_dir(), name, max_age=365 * 24 * 3600)
+    response.cache_control.immutable = True
+    response.cache_control.public = True
+    return response
+
+
+def sync(ids, workers=8, force=False):
+    # mirror sprites and cries into the object store; returns (skipped, stored, failed)
+    os.makedirs(objects_dir(), exist_ok=True)
+    manifest = {**empty_manifest(), **copy.deepcopy(load_manifest())}
+    timeout = current_app.config['POKEAPI_TIMEOUT']
+    todo = [
+        (kind, pokemon_id) for pokemon_id in ids for kind in SOURCES
+        if force or str(pokemon_id) not in manifest[kind]
+    ]
+
+    def fetch(job):
+        kind, pokemon_id = job
+        url, _ = SOURCES[kind]
+        try:
+            res = _session.get(url.format(id=pokemon_id), timeout=timeout)
+            res.raise_for_status()
+            return job, res.content
+        except requests.RequestException:
+            return job, None
+
+    stored, failed = 0, []
+    # downloads run on the pool, writes and the manifest stay on this thread
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (kind, pokemon_id), content in pool.map(fetch, todo):
+            if content is None:
+                failed.append((kind, pokemon_id))
+                continue
+            manifest[kind][str(pokemon_id)] = put_object(content, SOURCES[kind][1])
+            stored += 1
+    save_manifest(manifest)
+    return len(ids) * len(SOURCES) - len(todo), stored, failed
+
+
+def build_sheets(per_sheet=60, columns=10, tile=96):
+    # pack card sprites in dex order into sheets of `per_sheet`, matching the index
+    # page size so one page of cards is usually one image; plus a CSS/JSON offset map
+    from PIL import Image
+
+    manifest = load_manifest()
+    ids = sorted(int(i) for i in manifest["sprites"])
+    if not ids:
+        raise ValueError("no sprites mirrored yet, run `flask sync-assets` first")
+
+    sheets, offsets = [], {}
+    for start in range(0, len(ids), per_sheet):
+        page = ids[start:start + per_sheet]
+        rows = (len(page) + columns - 1) // columns
+        sheet = Image.new("RGBA", (columns * tile, rows * tile))
+        for n, pokemon_id in enumerate(page):
+            with Image.open(os.path.join(objects_dir(), manifest["sprites"][str(pokemon_id)])) as sprite:
+                sprite = sprite.convert("RGBA")
+                sprite.thumbnail((tile, tile))
+                x, y = (n % columns) * tile, (n // columns) * tile
+                sheet.paste(sprite, (x + (tile - sprite.width) // 2, y + (tile - sprite.height) // 2))
+                offsets[str(pokemon_id)] = {"sheet": len(sheets), "x": x, "y": y}
+        buf = io.BytesIO()
+        sheet.save(buf, format="PNG", optimize=True)
+        sheets.append(put_object(buf.getvalue(), "png"))
+
+    css = [f".sprite{{display:inline-block;width:{tile}px;height:{tile}px;background-repeat:no-repeat}}"]
+    # urls are relative: the stylesheet is served from the same /assets/ directory
+    for pokemon_id, o in offsets.items():
+        css.append(
+            f".sprite-{pokemon_id}{{background-image:url({sheets[o['sheet']]});"
+            f"background-position:-{o['x']}px -{o['y']}px}}"
+        )
+    map_name = put_object(json.dumps({"tile": tile, "sheets": sheets, "offsets": offsets}).encode(), "json")
+    css_name = put_object("\n".join(css).encode(), "css")
+
+    manifest = {**empty_manifest(), **manifest, "sheets": {
+        "css": css_name, "map": map_name, "files": sheets, "ids": {i: True for i in offsets}
+    }}
+    save_manifest(manifest)
+    return len(sheets), len(offsets)
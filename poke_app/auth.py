@@ -1,4 +1,4 @@
-from flask import Blueprint, redirect, url_for, session, flash, render_template, request
+from flask import Blueprint, redirect, url_for, session, flash, render_template, request, current_app
 from flask_dance.consumer.storage.sqla import SQLAlchemyStorage
 from flask_dance.consumer import oauth_authorized
 from flask_dance.contrib.google import google
@@ -82,8 +82,9 @@ def google_logged_in(blueprint, token):
 
     # Use the Google OAuth session to get user info
     resp = blueprint.session.get("/oauth2/v2/userinfo")
-    print(f"Google response: {resp.status_code} - {resp.text}")
+    current_app.logger.debug("Google userinfo response: %s - %s", resp.status_code, resp.text)
     if not resp.ok:
+        current_app.logger.warning("Google userinfo request failed: %s", resp.status_code)
         return False
 
     info = resp.json()
@@ -0,0 +1,139 @@
+import json
+import os
+import subprocess
+import sys
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from . import assets, pokeapi_cache
+from .extensions import db
+from .models import Pokemon, PokemonType
+
+
+@click.command("warm-pokeapi")
+@click.option("--start", default=1, show_default=True)
+@click.option("--end", default=386, show_default=True)
+@click.option("--workers", default=8, show_default=True)
+@click.option("--force", is_flag=True, help="Revalidate entries even if they are still fresh.")
+@with_appcontext
+def warm_pokeapi(start, end, workers, force):
+    """Preload the PokéAPI mirror cache for a range of dex ids."""
+    cached, stored, failed = pokeapi_cache.warm(list(range(start, end + 1)), workers=workers, force=force)
+    click.echo(f"{cached} already fresh, {stored} fetched, {len(failed)} failed")
+    if failed:
+        click.echo(f"failed ids: {', '.join(map(str, failed))}")
+
+
+@click.command("sync-assets")
+@click.option("--start", default=1, show_default=True)
+@click.option("--end", default=386, show_default=True)
+@click.option("--workers", default=8, show_default=True)
+@click.option("--force", is_flag=True, help="Download again even if already mirrored.")
+@with_appcontext
+def sync_assets(start, end, workers, force):
+    """Mirror sprites and cries into the local content-addressed asset store."""
+    skipped, stored, failed = assets.sync(list(range(start, end + 1)), workers=workers, force=force)
+    click.echo(f"{skipped} already mirrored, {stored} downloaded, {len(failed)} failed")
+    if failed:
+        click.echo("failed: " + ", ".join(f"{kind}#{i}" for kind, i in failed))
+
+
+@click.command("build-sprite-sheets")
+@click.option("--per-sheet", default=None, type=int, help="Sprites per sheet (default: POKEMON_PAGE_SIZE).")
+@click.option("--columns", default=10, show_default=True)
+@with_appcontext
+def build_sprite_sheets(per_sheet, columns):
+    """Pack mirrored card sprites into sprite sheets plus a CSS/JSON offset map."""
+    per_sheet = per_sheet or current_app.config['POKEMON_PAGE_SIZE']
+    sheets, sprites = assets.build_sheets(per_sheet=per_sheet, columns=columns)
+    click.echo(f"{sprites} sprites packed into {sheets} sheets")
+
+
+@click.command("gc-sessions")
+@click.option("--batch-size", default=1000, show_default=True)
+@with_appcontext
+def gc_sessions(batch_size):
+    """Delete expired server-side sessions in batches (SESSION_TYPE=sqlalchemy); run from cron."""
+    from .sessions import gc_expired_sessions
+    deleted = gc_expired_sessions(current_app, batch_size=batch_size)
+    if deleted is None:
+        click.echo(f"nothing to do: the {current_app.config['SESSION_TYPE']} backend expires sessions itself")
+    else:
+        click.echo(f"{deleted} expired sessions deleted")
+
+
+@click.command("sync-pokemon-types")
+@with_appcontext
+def sync_pokemon_types():
+    """Rebuild the pokemon_type table from Pokemon.types."""
+    PokemonType.query.delete()
+    count = 0
+    for pokemon in Pokemon.query.all():
+        for t in (pokemon.types or "").split(","):
+            if t.strip():
+                db.session.add(PokemonType(pokemon_id=pokemon.id, type=t.strip()))
+                count += 1
+    db.session.commit()
+    click.echo(f"{count} type rows written")
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db():
+    """Create any missing tables (the deploy-time replacement for create-on-boot)."""
+    db.create_all()
+    click.echo("Ensured all tables are created.")
+
+
+# runs in a fresh interpreter so nothing is already imported
+STARTUP_PROBE = """
+import json, time
+began = time.perf_counter()
+from poke_app import create_app
+create_app()
+elapsed_ms = (time.perf_counter() - began) * 1000
+try:
+    import psutil
+    rss_mb = psutil.Process().memory_info().rss / 2**20
+except ImportError:
+    import resource
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+import sys
+heavy = sorted(m for m in ("pandas", "sklearn", "plotly", "gradio_client", "langchain", "chromadb") if m in sys.modules)
+print(json.dumps({"startup_ms": elapsed_ms, "rss_mb": rss_mb, "heavy_modules": heavy}))
+"""
+
+
+@click.command("check-startup")
+@click.option("--max-ms", default=1500.0, show_default=True, help="Budget for import + create_app().")
+@click.option("--max-rss-mb", default=150.0, show_default=True, help="Budget for worker RSS after boot.")
+def check_startup(max_ms, max_rss_mb):
+    """Boot the app in production mode in a subprocess and enforce a time/RSS budget."""
+    env = dict(os.environ, APP_ENV="production", AUTO_CREATE_TABLES="0")
+    out = subprocess.run([sys.executable, "-c", STARTUP_PROBE], env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise click.ClickException(f"startup probe failed (exit {out.returncode}):\n{out.stderr.strip()}")
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    click.echo(f"startup {result['startup_ms']:.0f} ms, rss {result['rss_mb']:.0f} MB")
+    problems = []
+    if result["startup_ms"] > max_ms:
+        problems.append(f"startup {result['startup_ms']:.0f} ms > {max_ms:.0f} ms")
+    if result["rss_mb"] > max_rss_mb:
+        problems.append(f"rss {result['rss_mb']:.0f} MB > {max_rss_mb:.0f} MB")
+    if result["heavy_modules"]:
+        problems.append(f"heavy modules imported at boot: {', '.join(result['heavy_modules'])}")
+    if problems:
+        raise click.ClickException("; ".join(problems))
+    click.echo("within budget")
+
+
+def register_commands(app):
+    app.cli.add_command(warm_pokeapi)
+    app.cli.add_command(sync_pokemon_types)
+    app.cli.add_command(init_db)
+    app.cli.add_command(check_startup)
+    app.cli.add_command(sync_assets)
+    app.cli.add_command(build_sprite_sheets)
+    app.cli.add_command(gc_sessions)
@@ -17,7 +17,18 @@ class Config(object):
     # Google Oauth
     GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID', None)
     GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET', None)
-    SESSION_TYPE = "filesystem"
+    # filesystem (one host) | sqlalchemy (shared across nodes) | cachelib (local stand-in)
+    SESSION_TYPE = os.getenv('SESSION_TYPE', 'filesystem')
+    SESSION_SQLALCHEMY_TABLE = os.getenv('SESSION_SQLALCHEMY_TABLE', 'sessions')
+    SESSION_CACHELIB_THRESHOLD = int(os.getenv('SESSION_CACHELIB_THRESHOLD', 10000))
+
+    # loaded users are cached per process; changes invalidate locally, other nodes within the TTL
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+
+    # development creates tables on boot; production leaves schema to `flask init-db`
+    APP_ENV = os.getenv('APP_ENV', 'development')
+    AUTO_CREATE_TABLES = os.getenv('AUTO_CREATE_TABLES', '1' if APP_ENV == 'development' else '0') == '1'
     # Enable/Disable Google  Login
     if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET:
         SOCIAL_AUTH_GOOGLE = True
@@ -35,4 +46,25 @@ class Config(object):
     )
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'poke__app/static/uploads')
\ No newline at end of file
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'poke__app/static/uploads')
+
+    # PokéAPI mirror cache (in-process LRU in front of the pokeapi_cache table)
+    POKEAPI_BASE_URL = os.getenv('POKEAPI_BASE_URL', 'https://pokeapi.co/api/v2')
+    POKEAPI_CACHE_TTL = int(os.getenv('POKEAPI_CACHE_TTL', 7 * 24 * 3600))
+    POKEAPI_LRU_SIZE = int(os.getenv('POKEAPI_LRU_SIZE', 512))
+    POKEAPI_TIMEOUT = float(os.getenv('POKEAPI_TIMEOUT', 10))
+
+    # Pokémon index pagination
+    POKEMON_PAGE_SIZE = int(os.getenv('POKEMON_PAGE_SIZE', 60))
+    POKEMON_MAX_PAGE_SIZE = int(os.getenv('POKEMON_MAX_PAGE_SIZE', 200))
+
+    # mirrored sprites/cries and sprite sheets (`flask sync-assets`, `flask build-sprite-sheets`)
+    ASSET_DIR = os.getenv('ASSET_DIR', os.path.join(basedir, 'asset_store'))
+
+    # RAG API (pokedex/rag_api.py); read timeout is the longest gap between streamed chunks
+    RAG_API_URL = os.getenv('RAG_API_URL', 'http://localhost:8000').rstrip('/')
+    RAG_CONNECT_TIMEOUT = float(os.getenv('RAG_CONNECT_TIMEOUT', 3))
+    RAG_READ_TIMEOUT = float(os.getenv('RAG_READ_TIMEOUT', 60))
+
+    # per-request sampling profiles (X-Profile: 1) are written here when set
+    PROFILE_DIR = os.getenv('PROFILE_DIR')
\ No newline at end of file
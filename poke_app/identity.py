@@ -0,0 +1,89 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from .extensions import db
+from .models import User
+
+USER_COLUMNS = [c.name for c in User.__table__.columns]
+
+
+class UserCache:
+    # user_id -> column values, expiring after `ttl` seconds; per process, so other
+    # nodes see a profile/password change at most `ttl` seconds late
+    def __init__(self, ttl=60, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._data.get(user_id)
+            if item is None:
+                return None
+            values, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[user_id]
+                return None
+            return values
+
+    def set(self, user_id, values):
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                # drop expired entries, and the oldest tenth if that wasn't enough
+                now = time.monotonic()
+                for key in [k for k, (_, exp) in self._data.items() if exp < now]:
+                    del self._data[key]
+                if len(self._data) >= self.maxsize:
+                    for key in list(self._data)[:max(1, self.maxsize // 10)]:
+                        del self._data[key]
+            self._data[user_id] = (values, time.monotonic() + self.ttl)
+
+    def pop(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = UserCache(current_app.config['USER_CACHE_TTL'], current_app.config['USER_CACHE_SIZE'])
+    return _cache
+
+
+def load_user(user_id):
+    # Flask-Login user_loader: a cache hit is merged into the session without a SELECT
+    user_id = int(user_id)
+    cache = get_user_cache()
+    values = cache.get(user_id) if cache.ttl > 0 else None
+    if values is not None:
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None and cache.ttl > 0:
+        cache.set(user_id, {c: getattr(user, c) for c in USER_COLUMNS})
+    return user
+
+
+def invalidate_user(user_id):
+    if _cache is not None:
+        _cache.pop(user_id)
+
+
+# any flush that changes or removes a user (password set, profile update) drops the cached copy
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.id)
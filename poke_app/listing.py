@@ -0,0 +1,66 @@
+import hashlib
+import threading
+
+from sqlalchemy import String, cast, func
+
+from .extensions import db
+from .models import Pokemon, PokemonType
+
+SPRITE_URL = "https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/{id}.png"
+
+# rendered first page of the index, keyed by catalog version
+_page_cache = {}
+_page_cache_lock = threading.Lock()
+
+
+def catalog_version():
+    # (row count, last update) changes whenever an ingest touches the table
+    count, last_modified = db.session.query(func.count(Pokemon.id), func.max(Pokemon.updated_at)).one()
+    return count, last_modified
+
+
+def catalog_etag(version, *parts):
+    count, last_modified, *extra = version
+    raw = "|".join([str(count), last_modified.isoformat() if last_modified else "", *map(str, extra), *map(str, parts)])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def like_prefix(text):
+    # the user's text is matched literally: % and _ are not wildcards
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def search_pokemon(q="", type_=None, page=1, per_page=60):
+    query = Pokemon.query
+    q = (q or "").strip().lstrip("#")
+    if q.isdigit():
+        query = query.filter(cast(Pokemon.id, String).like(f"{q}%"))
+    elif q:
+        # prefix match so the name index is usable
+        query = query.filter(Pokemon.name.like(like_prefix(q), escape="\\"))
+    if type_:
+        query = query.join(PokemonType).filter(PokemonType.type == type_.capitalize())
+    return query.order_by(Pokemon.id).paginate(page=page, per_page=per_page, error_out=False)
+
+
+def serialize(pokemon):
+    from .assets import sprite_class, sprite_url
+    return {
+        'id': pokemon.id,
+        'name': pokemon.name,
+        'types': [t.strip() for t in (pokemon.types or "").split(',') if t.strip()],
+        'sprite': sprite_url(pokemon.id),
+        'sprite_class': sprite_class(pokemon.id),
+    }
+
+
+def cached_page(version, render):
+    with _page_cache_lock:
+        html = _page_cache.get(version)
+    if html is None:
+        html = render()
+        with _page_cache_lock:
+            # only the current version is worth keeping
+            _page_cache.clear()
+            _page_cache[version] = html
+    return html
@@ -27,9 +27,23 @@ class OAuth(db.Model):
 
 class Pokemon(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     sprite = db.Column(db.String(255))
     height = db.Column(db.Integer)
     weight = db.Column(db.Integer)
     types = db.Column(db.String(255))
-    abilities = db.Column(db.String(255))
\ No newline at end of file
+    abilities = db.Column(db.String(255))
+    updated_at = db.Column(db.DateTime)
+    type_rows = db.relationship("PokemonType", backref="pokemon", cascade="all, delete-orphan")
+
+class PokemonType(db.Model):
+    # normalized copy of Pokemon.types so the index can filter by type with an index
+    pokemon_id = db.Column(db.Integer, db.ForeignKey("pokemon.id"), primary_key=True)
+    type = db.Column(db.String(20), primary_key=True, index=True)
+
+class PokeApiCache(db.Model):
+    # local mirror of /api/v2/pokemon/{id}, already trimmed to what the views use
+    id = db.Column(db.Integer, primary_key=True)
+    payload = db.Column(db.JSON, nullable=False)
+    etag = db.Column(db.String(255))
+    fetched_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from flask import abort, current_app
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import PokeApiCache
+from .tracing import pokeapi_lookups, span
+
+CRY_URL = "https://raw.githubusercontent.com/PokeAPI/cries/main/cries/pokemon/latest/{id}.ogg"
+
+# one pooled session per process, shared by every request thread
+_session = requests.Session()
+_lru = None
+_lru_lock = threading.Lock()
+
+
+class LRUCache:
+    # small thread-safe LRU holding (value, expires_at) pairs
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def get_lru():
+    global _lru
+    if _lru is None:
+        with _lru_lock:
+            if _lru is None:
+                _lru = LRUCache(current_app.config['POKEAPI_LRU_SIZE'])
+    return _lru
+
+
+def format_pokemon(data):
+    return {
+        'id': data['id'],
+        'name': data['name'].capitalize(),
+        'sprite': data['sprites']['front_default'],
+        'height': data['height'],
+        'weight': data['weight'],
+        'abilities': [a['ability']['name'] for a in data['abilities']],
+        'types': [t['type']['name'].capitalize() for t in data['types']],
+        'moves': [m['move']['name'] for m in data['moves']],
+        'cry_url': CRY_URL.format(id=data['id'])
+    }
+
+
+def fetch_upstream(pokemon_id, etag=None, base_url=None, timeout=None):
+    # returns (status, pokemon, etag); status is 200, 304 or 404
+    # no app context needed so it can run on worker threads
+    base_url = base_url or current_app.config['POKEAPI_BASE_URL']
+    timeout = timeout or current_app.config['POKEAPI_TIMEOUT']
+    headers = {'If-None-Match': etag} if etag else {}
+    res = _session.get(f"{base_url}/pokemon/{pokemon_id}", headers=headers, timeout=timeout)
+    if res.status_code == 304:
+        return 304, None, etag
+    if res.status_code == 404:
+        return 404, None, None
+    res.raise_for_status()
+    return 200, format_pokemon(res.json()), res.headers.get('ETag')
+
+
+def _is_fresh(row, ttl):
+    return row.fetched_at + timedelta(seconds=ttl) > datetime.utcnow()
+
+
+def _store(pokemon_id, row, status, pokemon, etag):
+    now = datetime.utcnow()
+    if status == 304:
+        row.fetched_at = now
+    elif row is None:
+        db.session.add(PokeApiCache(id=pokemon_id, payload=pokemon, etag=etag, fetched_at=now))
+        try:
+            db.session.commit()
+            return pokemon
+        except IntegrityError:
+            # a concurrent miss on the same id inserted it first; overwrite with ours
+            db.session.rollback()
+            row = db.session.get(PokeApiCache, pokemon_id)
+            row.payload = pokemon
+            row.etag = etag
+            row.fetched_at = now
+    else:
+        row.payload = pokemon
+        row.etag = etag
+        row.fetched_at = now
+    db.session.commit()
+    return row.payload
+
+
+def get_pokemon(pokemon_id):
+    # read-through: LRU -> pokeapi_cache table -> PokéAPI (ETag revalidated)
+    ttl = current_app.config['POKEAPI_CACHE_TTL']
+    lru = get_lru()
+    pokemon = lru.get(pokemon_id)
+    if pokemon is not None:
+        pokeapi_lookups.inc(tier="lru")
+        return pokemon
+
+    with span("pokeapi_db"):
+        row = db.session.get(PokeApiCache, pokemon_id)
+    if row is not None and _is_fresh(row, ttl):
+        pokeapi_lookups.inc(tier="db")
+        lru.set(pokemon_id, row.payload, ttl)
+        return row.payload
+
+    try:
+        with span("pokeapi_upstream"):
+            status, pokemon, etag = fetch_upstream(pokemon_id, etag=row.etag if row else None)
+    except requests.RequestException as e:
+        if row is None:
+            # nothing cached to fall back on: a bad gateway, not an unhandled 500
+            current_app.logger.warning("PokéAPI fetch failed for %s: %s", pokemon_id, e)
+            abort(502, description="PokéAPI is unavailable, try again shortly.")
+        # upstream down: a stale copy beats an error page
+        current_app.logger.warning("PokéAPI refresh failed for %s, serving stale copy: %s", pokemon_id, e)
+        pokeapi_lookups.inc(tier="stale")
+        return row.payload
+
+    pokeapi_lookups.inc(tier="upstream")
+    if status == 404:
+        return None
+    pokemon = _store(pokemon_id, row, status, pokemon, etag)
+    lru.set(pokemon_id, pokemon, ttl)
+    return pokemon
+
+
+def invalidate(pokemon_id):
+    get_lru().pop(pokemon_id)
+
+
+def warm(ids, workers=8, force=False):
+    # preload the DB tier; upstream calls run on a thread pool, writes stay on this thread
+    ttl = current_app.config['POKEAPI_CACHE_TTL']
+    base_url = current_app.config['POKEAPI_BASE_URL']
+    timeout = current_app.config['POKEAPI_TIMEOUT']
+    rows = {row.id: row for row in PokeApiCache.query.filter(PokeApiCache.id.in_(list(ids))).all()}
+    todo = [i for i in ids if force or i not in rows or not _is_fresh(rows[i], ttl)]
+
+    def job(pokemon_id):
+        row = rows.get(pokemon_id)
+        try:
+            return pokemon_id, fetch_upstream(pokemon_id, row.etag if row else None, base_url, timeout)
+        except requests.RequestException as e:
+            return pokemon_id, e
+
+    stored, failed = 0, []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for pokemon_id, result in pool.map(job, todo):
+            if isinstance(result, Exception) or result[0] == 404:
+                failed.append(pokemon_id)
+                continue
+            status, pokemon, etag = result
+            _store(pokemon_id, rows.get(pokemon_id), status, pokemon, etag)
+            invalidate(pokemon_id)
+            stored += 1
+    return len(ids) - len(todo), stored, failed
@@ -0,0 +1,36 @@
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from .tracing import propagation_headers
+
+# one pooled session per process; connections to the RAG API are reused across requests
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+
+def stream_answer(question):
+    # yields the /ask stream as text; failures become a short message in the stream
+    # because the page around it has already been sent
+    config = current_app.config
+    try:
+        with _session.post(
+            f"{config['RAG_API_URL']}/ask",
+            # a detail-page entry isn't a conversation; don't open a history session for it
+            json={"question": question, "stateless": True},
+            headers=propagation_headers(),
+            stream=True,
+            timeout=(config['RAG_CONNECT_TIMEOUT'], config['RAG_READ_TIMEOUT'])
+        ) as response:
+            if not response.ok:
+                current_app.logger.warning("RAG API returned %s for %r", response.status_code, question)
+                yield "Could not fetch Pokédex info from AI."
+                return
+            response.encoding = response.encoding or "utf-8"
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+    except requests.RequestException as e:
+        current_app.logger.warning("RAG API request failed for %r: %s", question, e)
+        yield "\n\n[Pokédex entry unavailable]"
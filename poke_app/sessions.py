@@ -0,0 +1,39 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import column, delete, select, table
+
+from .extensions import db
+
+
+def configure_session_backend(app):
+    # SESSION_TYPE=filesystem (default, single host) | sqlalchemy (shared table, any
+    # number of nodes) | cachelib (local key-value stand-in for development)
+    session_type = app.config['SESSION_TYPE']
+    if session_type == 'sqlalchemy':
+        app.config['SESSION_SQLALCHEMY'] = db
+        # expired rows are removed by `flask gc-sessions`, not on the request path
+        app.config.setdefault('SESSION_CLEANUP_N_REQUESTS', None)
+    elif session_type == 'cachelib':
+        from cachelib import FileSystemCache
+        app.config['SESSION_CACHELIB'] = FileSystemCache(
+            cache_dir=os.path.join(app.instance_path, 'sessions'),
+            threshold=app.config['SESSION_CACHELIB_THRESHOLD']
+        )
+
+
+def gc_expired_sessions(app, batch_size=1000):
+    # delete expired rows in small batches so the table is never locked for long
+    if app.config['SESSION_TYPE'] != 'sqlalchemy':
+        return None
+    sessions = table(app.config['SESSION_SQLALCHEMY_TABLE'], column('id'), column('expiry'))
+    deleted = 0
+    while True:
+        ids = db.session.execute(
+            select(sessions.c.id).where(sessions.c.expiry < datetime.utcnow()).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return deleted
+        db.session.execute(delete(sessions).where(sessions.c.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# the RAG service's metric primitives; the Flask app runs from the repo root
+from pokedex.metrics import REQUEST_ID, Counter, Histogram, Registry, Sampler
+
+logger = logging.getLogger("poke_app.trace")
+
+registry = Registry()
+request_ms = registry.add(Histogram("poke_app_request_ms", "Request duration", labels=("endpoint", "status")))
+stage_ms = registry.add(Histogram("poke_app_stage_ms", "Time per request stage", labels=("stage",)))
+pokeapi_lookups = registry.add(Counter("poke_app_pokeapi_lookups_total", "get_pokemon results by cache tier", labels=("tier",)))
+
+
+@contextmanager
+def span(stage):
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - began) * 1000
+        stage_ms.observe(ms, stage=stage)
+        if has_request_context() and "spans" in g:
+            g.spans.append((stage, ms))
+
+
+def request_id():
+    return g.get("request_id") if has_request_context() else None
+
+
+def propagation_headers():
+    # for outgoing calls (the RAG API) so both services log the same id
+    rid = request_id()
+    return {"X-Request-ID": rid} if rid else {}
+
+
+def init_tracing(app):
+    # request ids, per-stage spans logged on "poke_app.trace", /metrics, and
+    # X-Profile: 1 sampling when PROFILE_DIR is configured
+    profile_dir = app.config.get('PROFILE_DIR')
+
+    @app.before_request
+    def start_trace():
+        incoming = request.headers.get('X-Request-ID', '')
+        g.request_id = incoming if REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        g.trace_began = time.perf_counter()
+        g.spans = []
+        if profile_dir and request.headers.get('X-Profile') == '1':
+            # a worker thread serves one request at a time, so its stack is this request's
+            g.sampler = Sampler(threading.get_ident()).start()
+
+    @app.after_request
+    def tag_response(response):
+        response.headers['X-Request-ID'] = g.request_id
+        g.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_trace(exc):
+        if "trace_began" not in g:
+            return
+        total = (time.perf_counter() - g.trace_began) * 1000
+        status = g.get("status", 500)
+        endpoint = request.endpoint or "unmatched"
+        request_ms.observe(total, endpoint=endpoint, status=status)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "request_id": g.request_id,
+                "endpoint": endpoint,
+                "status": status,
+                "total_ms": round(total, 2),
+                "spans": [{"stage": n, "ms": round(ms, 2)} for n, ms in g.spans],
+            }))
+        sampler = g.pop("sampler", None)
+        if sampler is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+            sampler.stop(os.path.join(profile_dir, f"{g.request_id}.folded"))
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
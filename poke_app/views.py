@@ -1,89 +1,109 @@
-from flask import Blueprint, render_template, render_template, request, jsonify, flash, redirect, url_for, session, current_app, send_file
+from flask import Blueprint, render_template, render_template, request, jsonify, flash, redirect, url_for, session, current_app, send_file, make_response, Response, stream_with_context
 from flask_login import login_required, current_user
 import logging
 import os
-from gradio_client import Client, handle_file
-import pandas as pd
 from werkzeug.utils import secure_filename
 from .config import Config
-import plotly.express as px
-import plotly
 import json
-import requests
-from .models import Pokemon
+from .pokeapi_cache import get_pokemon
+from .assets import localize, manifest_version
+from .listing import cached_page, catalog_etag, catalog_version, search_pokemon, serialize
+from .rag_client import stream_answer
+from .tracing import span
 
 views = Blueprint("views", __name__)
+logger = logging.getLogger(__name__)
 
 @views.route("/home")
 @views.route("/")
 @login_required
 def home():
-    pokemon_list = Pokemon.query.all()
-    return render_template('index.html', pokemon_list=pokemon_list)
+    # first page only, the rest is fetched from /api/pokemon as the user scrolls
+    # new sprite sheets change the markup too
+    version = catalog_version() + (manifest_version(),)
+    etag = catalog_etag(version, 'home')
+    per_page = current_app.config['POKEMON_PAGE_SIZE']
 
+    def render():
+        with span("search"):
+            page = search_pokemon(per_page=per_page)
+        return render_template('index.html', pokemon_list=page.items, has_next=page.has_next, per_page=per_page)
 
-@views.route('/pokemon/<int:pokemon_id> ', methods=['GET'])
+    response = make_response(cached_page(version, render))
+    response.set_etag(etag)
+    response.last_modified = version[1]
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@views.route('/api/pokemon')
+@login_required
+def list_pokemon():
+    q = request.args.get('q', '')
+    type_ = request.args.get('type') or None
+    page = request.args.get('page', 1, type=int)
+    per_page = min(
+        request.args.get('per_page', current_app.config['POKEMON_PAGE_SIZE'], type=int),
+        current_app.config['POKEMON_MAX_PAGE_SIZE']
+    )
+
+    version = catalog_version() + (manifest_version(),)
+    with span("search"):
+        result = search_pokemon(q, type_, page, per_page)
+    response = jsonify({
+        'items': [serialize(p) for p in result.items],
+        'page': result.page,
+        'per_page': result.per_page,
+        'total': result.total,
+        'pages': result.pages,
+        'next': result.next_num if result.has_next else None,
+    })
+    response.set_etag(catalog_etag(version, q, type_, page, per_page))
+    response.last_modified = version[1]
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@views.route('/pokemon/<int:pokemon_id>', methods=['GET'])
 @login_required
 def show_pokemon(pokemon_id):
-    url = f"https://pokeapi.co/api/v2/pokemon/{pokemon_id}"
-    res = requests.get(url)
-    if res.status_code != 200:
+    # structured data renders right away; the entry is streamed in by the page
+    pokemon = get_pokemon(pokemon_id)
+    if pokemon is None:
         return "Pokemon not found", 404
 
-    data = res.json()
-    pokemon = {
-        'id': data['id'],
-        'name': data['name'].capitalize(),
-        'sprite': data['sprites']['front_default'],
-        'height': data['height'],
-        'weight': data['weight'],
-        'abilities': [a['ability']['name'] for a in data['abilities']],
-        'types': [t['type']['name'].capitalize() for t in data['types']],
-        'moves': [m['move']['name'] for m in data['moves']],
-        'cry_url': f"https://raw.githubusercontent.com/PokeAPI/cries/main/cries/pokemon/latest/{pokemon_id}.ogg"
-    }
-
-    print(f"Pokemon data fetched: {pokemon}")
-
-    # Send name to RAG agent
-    try:
-        response = requests.post(
-            "http://localhost:8000/ask",  # your FastAPI RAG endpoint
-            json={"question": f"Give me full Pokédex info about {pokemon['name']}"}
-        )
-        if response.ok:
-            print(response.json())
-            pokedex_entry = response.json().get("answer", "")
-        else:
-            print(response.json())
-            pokedex_entry = "Could not fetch Pokédex info from AI."
-    except Exception as e:
-        pokedex_entry = f"Error: {str(e)}"
-
-    print(f"Pokédex entry fetched: {pokedex_entry}")
-    return render_template('detail.html', pokemon=pokemon, pokedex_entry=pokedex_entry)
+    logger.debug("Pokemon data fetched: %s", pokemon)
+    with span("render"):
+        return render_template('detail.html', pokemon=localize(pokemon))
+
+
+@views.route('/pokemon/<int:pokemon_id>/entry')
+@login_required
+def stream_pokedex_entry(pokemon_id):
+    # proxies the RAG API's text stream chunk by chunk instead of buffering the answer
+    pokemon = get_pokemon(pokemon_id)
+    if pokemon is None:
+        return "Pokemon not found", 404
+
+    def generate():
+        # a bare name is what the entry store and answer cache are keyed on
+        with span("rag_stream"):
+            yield from stream_answer(pokemon['name'])
+
+    response = Response(stream_with_context(generate()), mimetype='text/plain')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
 
 @views.route('/pokemon/<int:pokemon_id>/json')
 @login_required
 def get_pokemon_json(pokemon_id):
-    url = f"https://pokeapi.co/api/v2/pokemon/{pokemon_id}"
-    res = requests.get(url)
-    if res.status_code != 200:
+    pokemon = get_pokemon(pokemon_id)
+    if pokemon is None:
         return jsonify({'error': 'Pokemon not found'}), 404
-
-    data = res.json()
-    pokemon = {
-        'id': data['id'],
-        'name': data['name'].capitalize(),
-        'sprite': data['sprites']['front_default'],
-        'height': data['height'],
-        'weight': data['weight'],
-        'abilities': [a['ability']['name'] for a in data['abilities']],
-        'types': [t['type']['name'].capitalize() for t in data['types']],
-        'moves': [m['move']['name'] for m in data['moves']],
-        'cry_url': f"https://raw.githubusercontent.com/PokeAPI/cries/main/cries/pokemon/latest/{pokemon_id}.ogg"
-    }
-    return jsonify(pokemon)
+    return jsonify(localize(pokemon))
 
 
 
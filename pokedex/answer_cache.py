@@ -0,0 +1,134 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_question(question):
+    q = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(q.split())
+
+
+def context_fingerprint(docs, history=()):
+    # everything besides the question that goes into the prompt: the retrieved records
+    # and the conversation so far, so one session never replays another's follow-up
+    h = hashlib.sha256()
+    for doc in docs:
+        h.update(doc.page_content.encode("utf-8"))
+        h.update(b"\0")
+    h.update(b"\1")
+    for message in history:
+        h.update(f"{message.type}:{message.content}".encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def unit(vector):
+    # stored normalized, so a lookup is one matrix-vector product of cosine scores
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else None
+
+
+class AnswerCache:
+    # exact tier keyed on (normalized question, context + history fingerprint, model);
+    # optional semantic tier reuses an answer for a near-identical question embedding
+    # but only if retrieval produced the same context
+    def __init__(self, maxsize=1024, ttl=24 * 3600, semantic_threshold=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self._entries = OrderedDict()
+        # unit embeddings grouped by (fingerprint, model); the semantic tier only ever
+        # compares against entries that share the exact context
+        self._vectors = {}
+        self._lock = threading.Lock()
+        self._index_version = None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @property
+    def semantic(self):
+        return self.semantic_threshold is not None
+
+    def _key(self, question, fingerprint, model):
+        return (normalize_question(question), fingerprint, model)
+
+    def get(self, question, fingerprint, model, embedding=None):
+        key = self._key(question, fingerprint, model)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["answer"]
+
+            vectors = self._vectors.get(key[1:]) if self.semantic and embedding is not None else None
+            query = unit(embedding) if vectors else None
+            if query is not None:
+                keys = [k for k in vectors if self._entries[k]["expires_at"] > now]
+                if keys:
+                    scores = np.stack([vectors[k] for k in keys]) @ query
+                    i = int(scores.argmax())
+                    if scores[i] >= self.semantic_threshold:
+                        self._entries.move_to_end(keys[i])
+                        self.semantic_hits += 1
+                        return self._entries[keys[i]]["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, question, fingerprint, model, answer, embedding=None):
+        key = self._key(question, fingerprint, model)
+        vector = unit(embedding) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = {"answer": answer, "expires_at": time.time() + self.ttl}
+            self._entries.move_to_end(key)
+            self._drop_vector(key)
+            if vector is not None:
+                self._vectors.setdefault(key[1:], {})[key] = vector
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._drop_vector(evicted)
+
+    def _drop_vector(self, key):
+        vectors = self._vectors.get(key[1:])
+        if vectors is not None:
+            vectors.pop(key, None)
+            if not vectors:
+                del self._vectors[key[1:]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+    def sync_index_version(self, version):
+        # drop everything once the vector store has been re-indexed
+        with self._lock:
+            if self._index_version is not None and version != self._index_version:
+                self._entries.clear()
+                self._vectors.clear()
+            self._index_version = version
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
+
+
+def replay(answer, size=16):
+    # cached answers go back out in small pieces so the client sees the same stream
+    for i in range(0, len(answer), size):
+        yield answer[i:i + size]
@@ -0,0 +1,131 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers.string import StrOutputParser
+
+from answer_cache import context_fingerprint, normalize_question
+from filters import extract_filter
+from prompting import prompt_template
+from retrieval import HybridRetriever, ParentRetriever, reciprocal_rank_fusion, resolve_parents
+
+
+def infer_filters(questions, species_index=None):
+    abilities = species_index.abilities if species_index else ()
+    return [extract_filter(q, abilities) for q in questions]
+
+
+def unwrap(retriever):
+    # RoutedRetriever(ParentRetriever(leaf)) -> (species index, parent retriever or None, leaf)
+    species_index = getattr(retriever, "species_index", None)
+    inner = getattr(retriever, "fallback", retriever)
+    parent = inner if isinstance(inner, ParentRetriever) else None
+    return species_index, parent, parent.child if parent else inner
+
+
+def chroma_query(vector_store, vectors, k, where=None):
+    # Chroma answers many query embeddings in one call
+    result = vector_store._collection.query(
+        query_embeddings=vectors, n_results=k, where=where or None, include=["documents", "metadatas"]
+    )
+    return [
+        [Document(id=id_, page_content=text, metadata=meta or {}) for id_, text, meta in zip(ids, texts, metas)]
+        for ids, texts, metas in zip(result["ids"], result["documents"], result["metadatas"])
+    ]
+
+
+def search_by_vectors(leaf, questions, vectors, where=None):
+    # one search for a group of queries that share a filter
+    if hasattr(leaf, "search_vectors"):
+        # MatrixRetriever: one block-wise matrix product for the whole group
+        return leaf.search_vectors(vectors, filter=where)
+    if isinstance(leaf, HybridRetriever):
+        dense = chroma_query(leaf.vector_store, vectors, leaf.k_dense, where)
+        return [
+            reciprocal_rank_fusion([hits, leaf.lexical(q, filter=where)], leaf.k, leaf.rrf_k)
+            for q, hits in zip(questions, dense)
+        ]
+    return chroma_query(leaf.vectorstore, vectors, leaf.search_kwargs.get("k", 4), where)
+
+
+def retrieve_batch(retriever, embeddings, questions, wheres=None):
+    # docs per question, like retriever.invoke(q, filter=where) for each, but with one
+    # embedding call for the batch, one search per distinct filter and one core lookup
+    wheres = wheres or [None] * len(questions)
+    species_index, parent, leaf = unwrap(retriever)
+    results = [None] * len(questions)
+
+    pending = []
+    for i, q in enumerate(questions):
+        ids = species_index.resolve(q) if species_index else None
+        if ids:
+            results[i] = species_index.documents(ids)
+        else:
+            pending.append(i)
+    if not pending:
+        return results
+
+    unique = list(dict.fromkeys(questions[i] for i in pending))
+    vectors = dict(zip(unique, embeddings.embed_documents(unique)))
+
+    groups = {}
+    for i in pending:
+        groups.setdefault(json.dumps(wheres[i], sort_keys=True), []).append(i)
+    for members in groups.values():
+        hits = search_by_vectors(
+            leaf, [questions[i] for i in members], [vectors[questions[i]] for i in members], wheres[members[0]]
+        )
+        for i, docs in zip(members, hits):
+            results[i] = docs
+
+    if parent is not None:
+        hits = [doc for i in pending for doc in results[i]]
+        # a core one question hit directly serves every other question on that record
+        cores = {doc.metadata["parent"]: doc for doc in hits if doc.metadata.get("kind") == "core"}
+        cores.update(parent.cores(hits))
+        for i in pending:
+            results[i] = resolve_parents(results[i], cores, parent.k)
+    return results
+
+
+def group_jobs(questions, docs_per_question):
+    # the same question over the same context is generated once for every index asking it
+    jobs = {}
+    for i, (q, docs) in enumerate(zip(questions, docs_per_question)):
+        key = (normalize_question(q), context_fingerprint(docs))
+        jobs.setdefault(key, []).append(i)
+    return list(jobs.values())
+
+
+def result_lines(questions, indices, **fields):
+    return [
+        json.dumps({"index": i, "question": questions[i], **fields}, ensure_ascii=False) + "\n"
+        for i in indices
+    ]
+
+
+def run_batch(questions, retriever, embeddings, pool, assembler, workers=2):
+    # yields NDJSON lines as generations finish (thread pool, like entries.generate_entries)
+    species_index, _, _ = unwrap(retriever)
+    docs = retrieve_batch(retriever, embeddings, questions, infer_filters(questions, species_index))
+    jobs = group_jobs(questions, docs)
+    print(f"batch: {len(questions)} questions, {len(jobs)} generations.")
+
+    def job(indices):
+        inputs, _ = assembler.assemble(questions[indices[0]], docs[indices[0]], [])
+        with pool.lease() as backend:
+            return (prompt_template | backend.llm | StrOutputParser()).invoke(inputs)
+
+    began, failed = time.perf_counter(), 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(job, indices): indices for indices in jobs}
+        for future in as_completed(futures):
+            try:
+                answer = future.result()
+            except Exception as e:
+                failed += 1
+                yield from result_lines(questions, futures[future], error=str(e))
+                continue
+            yield from result_lines(questions, futures[future], answer=answer, source="generated")
+    print(f"batch: done in {time.perf_counter() - began:.1f}s, {failed} generations failed.")
@@ -0,0 +1,494 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from dotenv import load_dotenv
+from langchain_chroma import Chroma
+
+from embeddings import build_embeddings
+from indexer import chunking_mode, iter_chunks, read_index_version, sync_chunks
+from retrieval import build_leaf_retriever, build_retriever
+
+load_dotenv(override=True)
+
+db_dir = os.getenv('DB_DIRECTORY')
+collection = os.getenv('COLLECTION_NAME')
+model_name = os.getenv('EMBEDDING_MODEL_NAME')
+
+
+def load_rows(path=None):
+    # rows dumped to JSON keep the benchmark runnable without MySQL
+    if path:
+        with open(path) as f:
+            return json.load(f)
+    from data import fetch_rows
+    return fetch_rows()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    i = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[i]
+
+
+def labeled_questions(rows, per_kind=50, seed=0):
+    # each question lists every pokemon:{id} source that correctly answers it
+    rng = random.Random(seed)
+    by_move, by_ability = {}, {}
+    for row in rows:
+        source = f"pokemon:{row['id']}"
+        for move in json.loads(row['moves']):
+            by_move.setdefault(move, set()).add(source)
+        for ability in json.loads(row['abilities']):
+            by_ability.setdefault(ability, set()).add(source)
+
+    questions = []
+    for row in rng.sample(rows, min(per_kind, len(rows))):
+        questions.append({
+            "kind": "species",
+            "question": f"What abilities does {row['name']} have?",
+            "relevant": [f"pokemon:{row['id']}"],
+        })
+    for move in rng.sample(sorted(by_move), min(per_kind, len(by_move))):
+        questions.append({
+            "kind": "move",
+            "question": f"Which Pokémon learn {move}?",
+            "relevant": sorted(by_move[move]),
+        })
+    for ability in rng.sample(sorted(by_ability), min(per_kind, len(by_ability))):
+        questions.append({
+            "kind": "ability",
+            "question": f"Which Pokémon have the ability {ability}?",
+            "relevant": sorted(by_ability[ability]),
+        })
+    return questions
+
+
+def recall_at_k(docs, relevant, k):
+    got = {doc.metadata.get("source") for doc in docs[:k]}
+    relevant = set(relevant)
+    return len(got & relevant) / min(k, len(relevant))
+
+
+def summarize_ms(latencies):
+    return {
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def bench_retriever(retriever, questions, k):
+    retriever.invoke(questions[0]["question"])  # warm-up (loads BM25, opens segments)
+    latencies, recalls = [], {}
+    for q in questions:
+        began = time.perf_counter()
+        docs = retriever.invoke(q["question"])
+        latencies.append(time.perf_counter() - began)
+        recalls.setdefault(q["kind"], []).append(recall_at_k(docs, q["relevant"], k))
+    result = summarize_ms(latencies)
+    all_recalls = [r for rs in recalls.values() for r in rs]
+    result[f"recall@{k}"] = statistics.fmean(all_recalls)
+    for kind, rs in recalls.items():
+        result[f"recall@{k}_{kind}"] = statistics.fmean(rs)
+    return result
+
+
+def open_vector_store():
+    return Chroma(
+        collection_name=collection,
+        persist_directory=db_dir,
+        embedding_function=build_embeddings(model_name)
+    )
+
+
+def use_offline_backends():
+    # deterministic embedder, no embedding cache: numbers don't depend on Ollama or warm disks
+    os.environ["EMBEDDING_BACKEND"] = "fake"
+    os.environ["EMBEDDING_CACHE_PATH"] = ""
+
+
+def build_offline_index(rows, directory):
+    # the same path as `python main.py db`, against a throwaway collection
+    vector_store = Chroma(
+        collection_name="bench",
+        persist_directory=directory,
+        embedding_function=build_embeddings("bench")
+    )
+    began = time.perf_counter()
+    chunks = list(iter_chunks(rows))
+    split_s = time.perf_counter() - began
+    sync_chunks(vector_store, chunks)
+    build_s = time.perf_counter() - began
+    return vector_store, chunks, split_s, build_s
+
+
+def run_index(args):
+    use_offline_backends()
+    rows = load_rows(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store, chunks, split_s, build_s = build_offline_index(rows, directory)
+        print(f"bench: indexed {len(rows)} rows / {len(chunks)} chunks in {build_s:.2f}s")
+        # a rerun with nothing changed should only cost the hash comparison
+        began = time.perf_counter()
+        stats = sync_chunks(vector_store, chunks)
+        rerun_s = time.perf_counter() - began
+    return {"index": {
+        "rows": len(rows),
+        "chunks": len(chunks),
+        "chunking": chunking_mode(),
+        "chunk_chars": sum(len(c.page_content) for c in chunks),
+        "split_s": split_s,
+        "build_s": build_s,
+        "rows_per_sec": len(rows) / build_s,
+        "chunks_per_sec": len(chunks) / build_s,
+        "noop_rerun_s": rerun_s,
+        "noop_rerun_unchanged": stats["unchanged"],
+    }}
+
+
+def run_retrieval(args):
+    rows = load_rows(args.rows)
+    questions = labeled_questions(rows, args.per_kind, args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        if args.offline:
+            use_offline_backends()
+            vector_store, _, _, _ = build_offline_index(rows, directory)
+            index_dir = directory
+        else:
+            vector_store, index_dir = open_vector_store(), db_dir
+        results = {}
+        for mode in args.modes:
+            for k in args.k:
+                print(f"bench: {mode} k={k} over {len(questions)} questions")
+                results[f"{mode}@{k}"] = bench_retriever(build_retriever(vector_store, index_dir, mode, k), questions, k)
+    return {"retrieval": results}
+
+
+def run_probe(args):
+    # one backend per process, so RSS isn't polluted by the other backends
+    import psutil
+    process = psutil.Process()
+    rss_start = process.memory_info().rss
+    with open(args.questions) as f:
+        questions = json.load(f)
+    embeddings = build_embeddings(args.model)
+    if args.backend == "matrix":
+        from matrix_index import MatrixRetriever
+        retriever = MatrixRetriever(embeddings=embeddings, directory=args.matrix_dir, db_dir=args.dir, k=args.k)
+    else:
+        vector_store = Chroma(collection_name=args.collection, persist_directory=args.dir, embedding_function=embeddings)
+        # leaf retriever on both sides: this compares the vector backends, not parent resolution
+        retriever = build_leaf_retriever(vector_store, args.dir, "similarity", args.k)
+
+    retriever.invoke(questions[0]["question"])
+    latencies, recalls, ids = [], [], []
+    for q in questions:
+        began = time.perf_counter()
+        docs = retriever.invoke(q["question"])
+        latencies.append(time.perf_counter() - began)
+        recalls.append(recall_at_k(docs, q["relevant"], args.k))
+        ids.append([doc.id for doc in docs])
+    result = summarize_ms(latencies)
+    result[f"recall@{args.k}"] = statistics.fmean(recalls)
+    result["rss_mb"] = process.memory_info().rss / 2**20
+    result["rss_delta_mb"] = (process.memory_info().rss - rss_start) / 2**20
+    result["ids"] = ids
+    print(json.dumps(result))
+
+
+def run_matrix(args):
+    # Chroma similarity vs the exported NumPy matrix (per dtype) at the same k
+    from matrix_index import export_matrix
+    rows = load_rows(args.rows)
+    questions = labeled_questions(rows, args.per_kind, args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        if args.offline:
+            use_offline_backends()
+            vector_store, _, _, _ = build_offline_index(rows, directory)
+            index_dir, coll, model = directory, "bench", "bench"
+        else:
+            vector_store, index_dir, coll, model = open_vector_store(), db_dir, collection, model_name
+        questions_path = os.path.join(directory, "questions.json")
+        with open(questions_path, "w") as f:
+            json.dump(questions, f)
+
+        backends = {"chroma": []}
+        for dtype in args.dtypes:
+            out = os.path.join(directory, f"matrix-{dtype}")
+            count, nbytes = export_matrix(vector_store, out, dtype, read_index_version(index_dir))
+            print(f"bench: exported {count} vectors as {dtype} ({nbytes / 2**20:.2f} MiB)")
+            backends[f"matrix-{dtype}"] = ["--backend", "matrix", "--matrix-dir", out]
+
+        # .env was already applied to this process; the children inherit it as-is
+        env = dict(os.environ, PYTHON_DOTENV_DISABLED="1")
+        results = {}
+        for name, extra in backends.items():
+            print(f"bench: {name} k={args.k} over {len(questions)} questions")
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "probe", "--questions", questions_path,
+                 "--dir", index_dir, "--collection", coll, "--model", model, "--k", str(args.k), *extra],
+                env=env, capture_output=True, text=True, check=True
+            )
+            results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # how often each matrix backend returns exactly Chroma's top-k
+    reference = results["chroma"].pop("ids")
+    for name, result in results.items():
+        if name == "chroma":
+            continue
+        got = result.pop("ids")
+        result[f"overlap@{args.k}_vs_chroma"] = statistics.fmean(
+            len(set(a) & set(b)) / max(1, len(b)) for a, b in zip(got, reference)
+        )
+    return {"matrix": results}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_offline_server(rows_path, directory, args):
+    # rag_api in its own process with fake LLM + embeddings, fed from the rows dump
+    env = dict(
+        os.environ,
+        PYTHON_DOTENV_DISABLED="1",
+        LLM_BACKEND="fake",
+        EMBEDDING_BACKEND="fake",
+        EMBEDDING_CACHE_PATH="",
+        FAKE_LLM_TTFT=str(args.ttft),
+        FAKE_LLM_TOKENS_PER_SEC=str(args.tokens_per_sec),
+        POKEMON_ROWS_JSON=rows_path,
+        DB_DIRECTORY=directory,
+        COLLECTION_NAME="bench",
+        LLM_MODEL_NAME="fake",
+        EMBEDDING_MODEL_NAME="bench",
+        ENTRY_DB_PATH=os.path.join(directory, "entries.sqlite3"),
+        HISTORY_BACKEND="memory",
+        ANSWER_CACHE_SIZE="0",
+        ASK_MAX_CONCURRENT=str(args.max_concurrent),
+        LOG_LEVEL="WARNING",
+    )
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "rag_api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("rag_api exited during startup")
+        try:
+            if httpx.get(f"{url}/ready", timeout=1).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("rag_api did not become ready")
+
+
+async def timed_ask(client, url, question):
+    # TTFT is measured to the first streamed byte, tokens are whitespace-split words
+    began = time.perf_counter()
+    ttft, text = None, ""
+    async with client.stream("POST", f"{url}/ask", json={"question": question}) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return {"status": response.status_code}
+        async for piece in response.aiter_text():
+            if ttft is None:
+                ttft = time.perf_counter() - began
+            text += piece
+    total = time.perf_counter() - began
+    tokens = len(text.split())
+    streaming = total - (ttft or 0.0)
+    return {
+        "status": 200,
+        "ttft": ttft or total,
+        "total": total,
+        "tokens": tokens,
+        "tokens_per_sec": tokens / streaming if streaming > 0 else 0.0,
+    }
+
+
+async def drive(url, questions, concurrency):
+    queue = list(questions)
+    results = []
+
+    async def worker(client):
+        while queue:
+            results.append(await timed_ask(client, url, queue.pop()))
+
+    async with httpx.AsyncClient(timeout=300) as client:
+        began = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - began
+
+    ok = [r for r in results if r["status"] == 200]
+    summary = {
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected_429": sum(1 for r in results if r["status"] == 429),
+        "rejected_503": sum(1 for r in results if r["status"] == 503),
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "tokens_per_sec": statistics.fmean([r["tokens_per_sec"] for r in ok]) if ok else 0.0,
+    }
+    summary.update({f"ttft_{k}": v for k, v in summarize_ms([r["ttft"] for r in ok]).items()})
+    summary.update({f"total_{k}": v for k, v in summarize_ms([r["total"] for r in ok]).items()})
+    return summary
+
+
+def run_e2e(args):
+    rows = load_rows(args.rows)
+    questions = [q["question"] for q in labeled_questions(rows, args.per_kind, args.seed)]
+    with tempfile.TemporaryDirectory() as directory:
+        rows_path = os.path.join(directory, "rows.json")
+        with open(rows_path, "w") as f:
+            json.dump(rows, f, default=str)
+        use_offline_backends()
+        build_offline_index(rows, directory)
+
+        server, url = start_offline_server(rows_path, directory, args)
+        try:
+            results = {}
+            for concurrency in args.concurrency:
+                print(f"bench: /ask x{len(questions)} at concurrency {concurrency}")
+                results[f"c{concurrency}"] = asyncio.run(drive(url, questions, concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+    return {"e2e": results}
+
+
+def run_dump_rows(args):
+    rows = load_rows()
+    with open(args.out, "w") as f:
+        json.dump(rows, f, default=str)
+    print(f"bench: wrote {len(rows)} rows to {args.out}")
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def run_compare(args):
+    # per-metric change between two result files, e.g. before/after a PR
+    with open(args.before) as f:
+        before = flatten(json.load(f))
+    with open(args.after) as f:
+        after = flatten(json.load(f))
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        print(f"{key:<50} {old:>12.3f} {new:>12.3f} {change:>8}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pokédex RAG benchmarks.")
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    retrieval = sub.add_parser("retrieval", help="recall@k and latency per retrieval mode")
+    retrieval.add_argument("--modes", nargs="+", default=["similarity", "hybrid"])
+    retrieval.add_argument("--k", nargs="+", type=int, default=[4])
+    retrieval.add_argument("--per-kind", type=int, default=50)
+    retrieval.add_argument("--seed", type=int, default=0)
+    retrieval.add_argument("--rows", help="JSON dump of the Pokemon table instead of MySQL")
+    retrieval.add_argument("--offline", action="store_true", help="temp index with the fake embedder")
+    retrieval.add_argument("--out", default="bench_retrieval.json")
+    retrieval.set_defaults(run=run_retrieval)
+
+    index = sub.add_parser("index", help="offline index build rows/sec and chunks/sec")
+    index.add_argument("--rows")
+    index.add_argument("--out", default="bench_index.json")
+    index.set_defaults(run=run_index)
+
+    e2e = sub.add_parser("e2e", help="TTFT, tokens/sec and throughput through /ask with a fake LLM")
+    e2e.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    e2e.add_argument("--per-kind", type=int, default=20)
+    e2e.add_argument("--seed", type=int, default=0)
+    e2e.add_argument("--ttft", type=float, default=0.05)
+    e2e.add_argument("--tokens-per-sec", type=float, default=200)
+    e2e.add_argument("--max-concurrent", type=int, default=4, help="ASK_MAX_CONCURRENT for the server")
+    e2e.add_argument("--rows")
+    e2e.add_argument("--out", default="bench_e2e.json")
+    e2e.set_defaults(run=run_e2e)
+
+    matrix = sub.add_parser("matrix", help="NumPy matrix backend vs Chroma: latency, RSS, overlap")
+    matrix.add_argument("--dtypes", nargs="+", default=["float32", "float16", "int8"])
+    matrix.add_argument("--k", type=int, default=4)
+    matrix.add_argument("--per-kind", type=int, default=50)
+    matrix.add_argument("--seed", type=int, default=0)
+    matrix.add_argument("--rows")
+    matrix.add_argument("--offline", action="store_true")
+    matrix.add_argument("--out", default="bench_matrix.json")
+    matrix.set_defaults(run=run_matrix)
+
+    probe = sub.add_parser("probe")  # internal: one retriever per process for run_matrix
+    probe.add_argument("--questions", required=True)
+    probe.add_argument("--dir", required=True)
+    probe.add_argument("--collection")
+    probe.add_argument("--model")
+    probe.add_argument("--k", type=int, default=4)
+    probe.add_argument("--backend", default="chroma")
+    probe.add_argument("--matrix-dir")
+    probe.set_defaults(run=run_probe)
+
+    dump = sub.add_parser("dump-rows", help="save the Pokemon table as JSON for --rows")
+    dump.add_argument("--out", default="pokemon_rows.json")
+    dump.set_defaults(run=run_dump_rows)
+
+    compare = sub.add_parser("compare", help="diff two result files")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.set_defaults(run=run_compare)
+
+    args = parser.parse_args()
+    results = args.run(args)
+    if results is None:
+        return
+    results["meta"] = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
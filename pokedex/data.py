@@ -0,0 +1,41 @@
+import json
+import os
+from urllib.parse import quote_plus
+
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+
+# Connection to MySQL DB
+def connect():
+    return mysql.connector.connect(
+        host= os.getenv('DB_HOST'     , None),
+        user= os.getenv('DB_NAME', None),
+        password= quote_plus(os.getenv('DB_PASSWORD'     , None)),
+        database= os.getenv('DB_NAME'     , None)
+    )
+
+
+def iter_rows(page_size=500):
+    # unbuffered cursor read in pages: the result set is never held in memory at once
+    # POKEMON_ROWS_JSON: a dump from `python bench.py dump-rows`, for runs without MySQL
+    rows_json = os.getenv('POKEMON_ROWS_JSON')
+    if rows_json:
+        with open(rows_json) as f:
+            yield from json.load(f)
+        return
+    conn = connect()
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute("SELECT * FROM Pokemon ORDER BY id")
+        while page := cursor.fetchmany(page_size):
+            yield from page
+    finally:
+        # closing the connection also drops any unread rows if the caller stopped early
+        conn.close()
+
+
+def fetch_rows():
+    return list(iter_rows())
@@ -0,0 +1,162 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    # disk-backed vectors keyed by (model name, text hash)
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        found = {}
+        hashes = list(hashes)
+        with self._lock:
+            # stay below sqlite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                part = hashes[i:i + 500]
+                marks = ",".join("?" * len(part))
+                for h, blob in self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({marks})",
+                    [model, *part]
+                ):
+                    found[h] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model, h, array("f", vec).tobytes()) for h, vec in items]
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    # wraps any Embeddings: dedups, caches on disk, embeds misses in concurrent batches
+    def __init__(self, base, model_name, cache=None, batch_size=32, max_workers=4):
+        self.base = base
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._texts = 0
+            self._hits = 0
+            self._embedded = 0
+            self._embed_seconds = 0.0
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "texts": self._texts,
+                "cache_hits": self._hits,
+                "embedded": self._embedded,
+                "cache_hit_rate": self._hits / self._texts if self._texts else 0.0,
+                "embed_seconds": self._embed_seconds,
+                "texts_per_sec": self._embedded / self._embed_seconds if self._embed_seconds else 0.0,
+            }
+
+    def _embed_batch(self, batch):
+        return self.base.embed_documents(batch)
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(t) for t in texts]
+        vectors = self.cache.get_many(self.model_name, set(hashes)) if self.cache else {}
+
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in vectors:
+                missing.setdefault(h, t)
+        todo = list(missing.items())
+
+        began = time.perf_counter()
+        batches = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+        results = self._pool.map(self._embed_batch, [[t for _, t in b] for b in batches])
+        fresh = []
+        for batch, embedded in zip(batches, results):
+            fresh.extend(zip([h for h, _ in batch], embedded))
+        elapsed = time.perf_counter() - began
+
+        if fresh:
+            vectors.update(fresh)
+            if self.cache:
+                self.cache.put_many(self.model_name, fresh)
+
+        with self._stats_lock:
+            self._texts += len(texts)
+            self._hits += len(texts) - sum(1 for h in hashes if h in missing)
+            self._embedded += len(todo)
+            if todo:
+                self._embed_seconds += elapsed
+        return [vectors[h] for h in hashes]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeEmbeddings(Embeddings):
+    # deterministic hashed bag-of-words vectors: no server needed, and texts that
+    # share words still land close together, which keeps retrieval tests meaningful
+    def __init__(self, size=256):
+        self.size = size
+
+    def _embed(self, text):
+        vec = [0.0] * self.size
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            idx = int.from_bytes(digest[:4], "little") % self.size
+            vec[idx] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def build_embeddings(model_name, base=None):
+    # base: an existing client to wrap, e.g. ollama_pool.PooledEmbeddings
+    backend = os.getenv("EMBEDDING_BACKEND", "ollama")
+    if backend == "fake":
+        base = FakeEmbeddings()
+    elif base is None:
+        from langchain_ollama import OllamaEmbeddings
+        base = OllamaEmbeddings(model=model_name)
+
+    cache_path = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+    return CachedEmbeddings(
+        base,
+        model_name=f"{backend}:{model_name}",
+        cache=EmbeddingCache(cache_path) if cache_path else None,
+        batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 32)),
+        max_workers=int(os.getenv("EMBEDDING_WORKERS", 4)),
+    )
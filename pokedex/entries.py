@@ -0,0 +1,116 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.output_parsers.string import StrOutputParser
+
+from indexer import row_to_document
+from prompting import prompt, prompt_template
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def prompt_hash(assembler):
+    # anything that changes the rendered prompt for a bare lookup invalidates entries
+    return sha256(f"{prompt}|{assembler.budget}|{assembler.history_share}")
+
+
+def data_hash(row):
+    return sha256(row_to_document(row).page_content)
+
+
+class EntryStore:
+    # materialized Pokédex entries, one per species, tagged with the inputs that produced them
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " pokemon_id INTEGER PRIMARY KEY, name TEXT NOT NULL, entry TEXT NOT NULL,"
+            " model TEXT NOT NULL, prompt_hash TEXT NOT NULL, data_hash TEXT NOT NULL,"
+            " generated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, pokemon_id, model, prompt_hash, data_hash):
+        # only an entry built from exactly these inputs counts
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT entry FROM entries WHERE pokemon_id = ? AND model = ? AND prompt_hash = ? AND data_hash = ?",
+                (pokemon_id, model, prompt_hash, data_hash)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_record(self, pokemon_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pokemon_id, name, entry, model, generated_at FROM entries WHERE pokemon_id = ?",
+                (pokemon_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(["pokemon_id", "name", "entry", "model", "generated_at"], row))
+
+    def fingerprints(self):
+        with self._lock:
+            return {
+                pid: (model, p_hash, d_hash)
+                for pid, model, p_hash, d_hash in self._conn.execute(
+                    "SELECT pokemon_id, model, prompt_hash, data_hash FROM entries"
+                )
+            }
+
+    def put(self, pokemon_id, name, entry, model, prompt_hash, data_hash):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries"
+                " (pokemon_id, name, entry, model, prompt_hash, data_hash, generated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (pokemon_id, name, entry, model, prompt_hash, data_hash, time.time())
+            )
+            self._conn.commit()
+
+
+def build_entry_store():
+    return EntryStore(os.getenv("ENTRY_DB_PATH", "entries.sqlite3"))
+
+
+def generate_entries(species_index, pool, store, assembler, model, workers=4, force=False):
+    # regenerate only species whose model, prompt or record changed since the last run
+    p_hash = prompt_hash(assembler)
+    existing = store.fingerprints()
+    todo = []
+    for pid, row in sorted(species_index.by_id.items()):
+        d_hash = data_hash(row)
+        if force or existing.get(pid) != (model, p_hash, d_hash):
+            todo.append((pid, row, d_hash))
+    print(f"entries: {len(species_index.by_id) - len(todo)} up to date, generating {len(todo)}.")
+
+    def job(pid, row, d_hash):
+        # the same inputs /ask builds for a bare species question
+        inputs, _ = assembler.assemble(row["name"], species_index.documents([pid]), [])
+        with pool.lease() as backend:
+            entry = (prompt_template | backend.llm | StrOutputParser()).invoke(inputs)
+        store.put(pid, row["name"], entry, model, p_hash, d_hash)
+        return pid
+
+    began, done, failed = time.perf_counter(), 0, []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(job, *item): item[0] for item in todo}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed.append(futures[future])
+                print(f"entries: #{futures[future]} failed: {e}")
+                continue
+            done += 1
+            if done % 25 == 0:
+                print(f"entries: {done}/{len(todo)} generated")
+    print(f"entries: {done} generated in {time.perf_counter() - began:.1f}s, {len(failed)} failed.")
+    return done, failed
@@ -0,0 +1,42 @@
+import asyncio
+import hashlib
+import re
+import time
+from typing import Any, Optional
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+
+class FakeLLM(LLM):
+    # deterministic stand-in for OllamaLLM: echoes the tail of the prompt as a
+    # pseudo-answer with a configurable time-to-first-token and tokens/sec
+    ttft: float = 0.05
+    tokens_per_sec: float = 200.0
+    max_tokens: int = 120
+
+    @property
+    def _llm_type(self):
+        return "fake-pokedex"
+
+    def _tokens(self, prompt):
+        question = prompt.rsplit("Question:", 1)[-1].strip()
+        seed = hashlib.md5(prompt.encode("utf-8")).hexdigest()
+        words = re.findall(r"\S+", prompt)
+        body = [words[int(seed[i % 32], 16) * (i + 1) % len(words)] for i in range(self.max_tokens)] if words else []
+        return [f"Answer to {question}:"] + [f" {w}" for w in body]
+
+    def _call(self, prompt: str, stop: Optional[list] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.ttft)
+        for token in self._tokens(prompt):
+            time.sleep(1.0 / self.tokens_per_sec)
+            yield GenerationChunk(text=token)
+
+    async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.ttft)
+        for token in self._tokens(prompt):
+            await asyncio.sleep(1.0 / self.tokens_per_sec)
+            yield GenerationChunk(text=token)
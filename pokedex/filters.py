@@ -0,0 +1,132 @@
+import re
+
+from indexer import field_key
+
+# numeric metadata written by indexer.row_metadata, plus the spellings people use for them
+NUMERIC_FIELDS = {
+    "hp": "hp",
+    "attack": "attack", "atk": "attack",
+    "defense": "defense", "def": "defense",
+    "special_attack": "special_attack", "sp_atk": "special_attack", "spatk": "special_attack",
+    "special_defense": "special_defense", "sp_def": "special_defense", "spdef": "special_defense",
+    "speed": "speed", "spe": "speed",
+    "bst": "bst", "base_stat_total": "bst", "total": "bst",
+    "generation": "generation", "gen": "generation",
+    "height": "height", "weight": "weight",
+    "id": "dex_id", "dex_id": "dex_id",
+}
+
+TYPES = [
+    "normal", "fire", "water", "grass", "electric", "ice", "fighting", "poison", "ground",
+    "flying", "psychic", "bug", "rock", "ghost", "dragon", "dark", "steel", "fairy",
+]
+
+OPS = {">": "$gt", ">=": "$gte", "<": "$lt", "<=": "$lte", "=": "$eq", "==": "$eq", "!=": "$ne"}
+WORD_OPS = {
+    "above": ">", "over": ">", "more than": ">", "greater than": ">", "at least": ">=",
+    "below": "<", "under": "<", "less than": "<", "at most": "<=",
+}
+ROMAN = {"i": 1, "ii": 2, "iii": 3, "iv": 4, "v": 5, "vi": 6, "vii": 7, "viii": 8, "ix": 9}
+
+CLAUSE = re.compile(r"^\s*([\w. ]+?)\s*(contains|>=|<=|!=|==|>|<|=)\s*(.+?)\s*$", re.IGNORECASE)
+
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def parse_clause(clause):
+    match = CLAUSE.match(clause)
+    if not match:
+        raise ValueError(f"can't parse filter clause: {clause!r}")
+    field, op, value = field_key(match.group(1)), match.group(2).lower(), match.group(3).strip("'\" ")
+
+    if field in ("types", "type", "abilities", "ability"):
+        if op not in ("contains", "=", "=="):
+            raise ValueError(f"{field} only supports 'contains'")
+        prefix = "type" if field.startswith("type") else "ability"
+        return {f"{prefix}_{field_key(value)}": True}
+
+    if field not in NUMERIC_FIELDS or op == "contains":
+        raise ValueError(f"unknown filter field or operator: {clause!r}")
+    return {NUMERIC_FIELDS[field]: {OPS[op]: _number(value)}}
+
+
+def combine(clauses):
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def parse_filter(expr):
+    # "types contains Fire AND speed > 100 OR ..." -> Chroma where; AND binds tighter than OR
+    groups = []
+    for group in re.split(r"\s+OR\s+", expr.strip(), flags=re.IGNORECASE):
+        clauses = [parse_clause(c) for c in re.split(r"\s+AND\s+", group, flags=re.IGNORECASE) if c.strip()]
+        if clauses:
+            groups.append(combine(clauses))
+    if not groups:
+        return None
+    return groups[0] if len(groups) == 1 else {"$or": groups}
+
+
+def extract_filter(question, abilities=()):
+    # best-effort filters from plain questions like "steel-type with levitate and speed over 100"
+    q = question.lower()
+    clauses = []
+    for t in TYPES:
+        if re.search(rf"\b{t}[- ]type", q):
+            clauses.append({f"type_{t}": True})
+    for ability in abilities:
+        # only when phrased as an ability ("with levitate", "levitate ability"), so
+        # common words like "pressure" or "static" don't silently narrow the search
+        for name in {ability.lower(), ability.lower().replace("-", " ")}:
+            name = re.escape(name)
+            if re.search(rf"\b(?:with|has|have|having|ability)\s+(?:the\s+)?(?:ability\s+)?{name}\b|\b{name}\s+ability", q):
+                clauses.append({f"ability_{field_key(ability)}": True})
+                break
+
+    words = "|".join(sorted(WORD_OPS, key=len, reverse=True))
+    stat_names = "|".join(sorted((n.replace("_", "[ .]?") for n in NUMERIC_FIELDS), key=len, reverse=True))
+    for field, op, value in re.findall(rf"\b({stat_names})\s*(>=|<=|>|<|=|{words})\s*(\d+(?:\.\d+)?)", q):
+        key = NUMERIC_FIELDS.get(field_key(field.replace(" ", "_")))
+        if key:
+            clauses.append({key: {OPS[WORD_OPS.get(op, op)]: _number(value)}})
+
+    gen = re.search(r"\bgen(?:eration)?\s*(\d+|ix|viii|vii|vi|iv|v|iii|ii|i)\b", q)
+    if gen:
+        value = gen.group(1)
+        clauses.append({"generation": int(value) if value.isdigit() else ROMAN[value]})
+    return combine(clauses)
+
+
+def matches(meta, where):
+    # evaluate a Chroma-style where dict in Python (used on the BM25 leg)
+    if where is None:
+        return True
+    if "$and" in where:
+        return all(matches(meta, w) for w in where["$and"])
+    if "$or" in where:
+        return any(matches(meta, w) for w in where["$or"])
+    for field, cond in where.items():
+        value = meta.get(field)
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, target in cond.items():
+            if op == "$eq" and value != target:
+                return False
+            if op == "$ne" and value == target:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > target:
+                    return False
+                if op == "$gte" and not value >= target:
+                    return False
+                if op == "$lt" and not value < target:
+                    return False
+                if op == "$lte" and not value <= target:
+                    return False
+    return True
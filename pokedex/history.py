@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tokens import count_tokens
+
+
+def trim_to_budget(turns, max_tokens):
+    # keep the newest (question, answer) turns that fit in the budget
+    kept, used = [], 0
+    for question, answer in reversed(turns):
+        cost = count_tokens(question) + count_tokens(answer)
+        if used + cost > max_tokens:
+            break
+        kept.append((question, answer))
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def to_messages(turns):
+    messages = []
+    for question, answer in turns:
+        messages.append(HumanMessage(content=question))
+        messages.append(AIMessage(content=answer))
+    return messages
+
+
+class MemoryHistoryStore:
+    def __init__(self, max_tokens=1500, max_sessions=1000, ttl=3600):
+        self.max_tokens = max_tokens
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return []
+            turns, last_seen = item
+            if last_seen + self.ttl < time.time():
+                del self._sessions[session_id]
+                return []
+            self._sessions.move_to_end(session_id)
+            return to_messages(turns)
+
+    def append(self, session_id, question, answer):
+        with self._lock:
+            turns, last_seen = self._sessions.get(session_id, ([], 0))
+            if last_seen + self.ttl < time.time():
+                # an expired session starts over, as get() already treats it as empty
+                turns = []
+            turns = trim_to_budget(turns + [(question, answer)], self.max_tokens)
+            self._sessions[session_id] = (turns, time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+
+class SQLiteHistoryStore:
+    # same contract as MemoryHistoryStore, but shared by every worker on the box
+    def __init__(self, path, max_tokens=1500, max_sessions=1000, ttl=3600):
+        self.max_tokens = max_tokens
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " session_id TEXT NOT NULL, seq INTEGER NOT NULL,"
+            " question TEXT NOT NULL, answer TEXT NOT NULL,"
+            " PRIMARY KEY (session_id, seq));"
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, last_seen REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);"
+        )
+        self._conn.commit()
+
+    def get(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_seen FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None or row[0] + self.ttl < time.time():
+                return []
+            turns = self._conn.execute(
+                "SELECT question, answer FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return to_messages(turns)
+
+    def append(self, session_id, question, answer):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_seen FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is not None and row[0] + self.ttl < now:
+                # an expired session starts over, as get() already treats it as empty
+                self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            turns = self._conn.execute(
+                "SELECT seq, question, answer FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+            next_seq = turns[-1][0] + 1 if turns else 0
+            kept = trim_to_budget([(q, a) for _, q, a in turns] + [(question, answer)], self.max_tokens)
+            # kept is always a suffix, so everything before it can go
+            first_kept = next_seq + 1 - len(kept)
+            self._conn.execute("DELETE FROM turns WHERE session_id = ? AND seq < ?", (session_id, first_kept))
+            if kept:
+                self._conn.execute(
+                    "INSERT INTO turns (session_id, seq, question, answer) VALUES (?, ?, ?, ?)",
+                    (session_id, next_seq, question, answer)
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, last_seen) VALUES (?, ?)", (session_id, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        expired = "SELECT session_id FROM sessions WHERE last_seen < ?"
+        self._conn.execute(f"DELETE FROM turns WHERE session_id IN ({expired})", (now - self.ttl,))
+        self._conn.execute("DELETE FROM sessions WHERE last_seen < ?", (now - self.ttl,))
+        overflow = (
+            "SELECT session_id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?"
+        )
+        self._conn.execute(f"DELETE FROM turns WHERE session_id IN ({overflow})", (self.max_sessions,))
+        self._conn.execute(f"DELETE FROM sessions WHERE session_id IN ({overflow})", (self.max_sessions,))
+
+
+def build_history_store():
+    max_tokens = int(os.getenv("HISTORY_MAX_TOKENS", 1500))
+    max_sessions = int(os.getenv("HISTORY_MAX_SESSIONS", 1000))
+    ttl = int(os.getenv("HISTORY_TTL", 3600))
+    if os.getenv("HISTORY_BACKEND", "memory") == "sqlite":
+        path = os.getenv("HISTORY_DB_PATH", "history.sqlite3")
+        return SQLiteHistoryStore(path, max_tokens, max_sessions, ttl)
+    return MemoryHistoryStore(max_tokens, max_sessions, ttl)
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+splitter = RecursiveCharacterTextSplitter(
+    chunk_size=1000,
+    chunk_overlap=200
+)
+
+
+# last national dex number of each generation
+GENERATION_ENDS = [151, 251, 386, 493, 649, 721, 809, 905, 1025]
+
+
+def generation_of(dex_id):
+    for gen, last in enumerate(GENERATION_ENDS, start=1):
+        if dex_id <= last:
+            return gen
+    return len(GENERATION_ENDS) + 1
+
+
+def field_key(name):
+    return "_".join(str(name).lower().replace("-", " ").replace(".", " ").split())
+
+
+def parse_stats(raw):
+    # accepts {"hp": 45, ...} or PokéAPI-style [{"stat": {"name": "hp"}, "base_stat": 45}, ...]
+    stats = json.loads(raw) if isinstance(raw, str) else raw
+    if isinstance(stats, list):
+        stats = {
+            (s["stat"]["name"] if isinstance(s.get("stat"), dict) else s.get("name")): s.get("base_stat")
+            for s in stats
+        }
+    return {field_key(k): int(v) for k, v in (stats or {}).items() if v is not None}
+
+
+def row_metadata(row):
+    # flat scalars only, so Chroma can filter on them before scoring
+    types = json.loads(row['types'])
+    abilities = json.loads(row['abilities'])
+    stats = parse_stats(row['base_stats'])
+    meta = {
+        "source": f"pokemon:{row['id']}",
+        "dex_id": int(row['id']),
+        "name": row['name'],
+        "generation": generation_of(int(row['id'])),
+        "types": ",".join(types),
+        "abilities": ",".join(abilities),
+        "bst": sum(stats.values()),
+    }
+    for key in ("height", "weight"):
+        if row.get(key) is not None:
+            meta[key] = float(row[key])
+    meta.update(stats)
+    meta.update({f"type_{field_key(t)}": True for t in types})
+    meta.update({f"ability_{field_key(a)}": True for a in abilities})
+    return meta
+
+
+def row_to_document(row):
+    content = f"""
+    Name: {row['name']}
+    Dex ID: {row['id']}
+    Types: {json.loads(row['types'])}
+    Abilities: {json.loads(row['abilities'])}
+    Height: {row['height']} m
+    Weight: {row['weight']} kg
+    Base Stats: {json.loads(row['base_stats'])}
+    Moves: {json.loads(row['moves'])}
+    Cry URL: {row['cry_url']}
+    """
+    return Document(page_content=content, metadata=row_metadata(row))
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source, index):
+    # stable across runs, so re-indexing overwrites instead of duplicating
+    return f"{source}:{index}"
+
+
+def chunking_mode():
+    # entity: core + ability + move chunks per record; text: the character splitter
+    return os.getenv("CHUNKING", "entity")
+
+
+def _hashed(doc, id_, index):
+    doc.id = id_
+    doc.metadata["chunk"] = index
+    # metadata is part of the hash so a metadata-only change is re-upserted too
+    doc.metadata["content_hash"] = content_hash(
+        doc.page_content + json.dumps(doc.metadata, sort_keys=True, default=str)
+    )
+    return doc
+
+
+def group_items(items, max_chars):
+    # split a list at item boundaries, never inside an item and without overlap
+    groups, current, size = [], [], 0
+    for item in items:
+        if current and size + len(item) + 2 > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += len(item) + 2
+    if current:
+        groups.append(current)
+    return groups
+
+
+def entity_chunks(row, move_chars=800):
+    # one compact core chunk plus small child chunks that point back at it; every
+    # chunk carries the record's metadata so filters apply to children as well
+    meta = row_metadata(row)
+    source = meta["source"]
+    stats = parse_stats(row['base_stats'])
+    header = f"Name: {row['name']}\nDex ID: {row['id']}"
+    core = "\n".join([
+        header,
+        f"Types: {', '.join(json.loads(row['types']))}",
+        f"Abilities: {', '.join(json.loads(row['abilities']))}",
+        f"Height: {row['height']} m",
+        f"Weight: {row['weight']} kg",
+        f"Base Stats: {', '.join(f'{k} {v}' for k, v in stats.items())}",
+        f"Cry URL: {row['cry_url']}",
+    ])
+    chunks = [_hashed(Document(page_content=core, metadata={**meta, "kind": "core", "parent": source}), f"{source}:core", 0)]
+    for ability in json.loads(row['abilities']):
+        doc = Document(
+            page_content=f"{header}\nAbilities: {ability}",
+            metadata={**meta, "kind": "ability", "parent": source}
+        )
+        chunks.append(_hashed(doc, f"{source}:ability:{field_key(ability)}", len(chunks)))
+    for i, moves in enumerate(group_items(json.loads(row['moves']), move_chars)):
+        doc = Document(
+            page_content=f"{header}\nMoves: {', '.join(moves)}",
+            metadata={**meta, "kind": "moves", "parent": source}
+        )
+        chunks.append(_hashed(doc, f"{source}:moves:{i}", len(chunks)))
+    return chunks
+
+
+def split_document(doc):
+    chunks = splitter.split_documents([doc])
+    return [_hashed(chunk, chunk_id(doc.metadata["source"], i), i) for i, chunk in enumerate(chunks)]
+
+
+def split_documents(docs):
+    chunks = []
+    for doc in docs:
+        chunks.extend(split_document(doc))
+    return chunks
+
+
+def iter_chunks(rows, mode=None):
+    # lazy rows -> documents -> chunks, one row in memory at a time
+    mode = mode or chunking_mode()
+    for row in rows:
+        if mode == "entity":
+            yield from entity_chunks(row)
+        else:
+            yield from split_document(row_to_document(row))
+
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def index_version_path(db_dir):
+    return os.path.join(db_dir or ".", "index_version")
+
+
+def read_index_version(db_dir):
+    try:
+        with open(index_version_path(db_dir)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def new_index_version():
+    return str(time.time_ns())
+
+
+def bump_index_version(db_dir, version=None):
+    # readers (e.g. the answer cache) compare this to notice a re-index
+    version = version or new_index_version()
+    with open(index_version_path(db_dir), "w") as f:
+        f.write(version)
+    return version
+
+
+def sync_chunks(vector_store, chunks, batch_size=64, max_in_flight=2, progress=None):
+    # upsert only new/changed chunks and delete the ones that no longer exist;
+    # chunks may be any iterable (e.g. iter_chunks over a DB cursor): it is consumed
+    # batch by batch and at most max_in_flight batches are embedding/upserting at once
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    seen = set()
+    began = time.perf_counter()
+    pending = deque()
+
+    def upsert(changed):
+        vector_store.add_documents(changed, ids=[c.id for c in changed])
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for batch in batched(chunks, batch_size):
+            ids = [c.id for c in batch]
+            seen.update(ids)
+            existing = vector_store.get(ids=ids, include=["metadatas"])
+            stored_hashes = {
+                id_: (meta or {}).get("content_hash")
+                for id_, meta in zip(existing["ids"], existing["metadatas"])
+            }
+            changed = [c for c in batch if stored_hashes.get(c.id) != c.metadata["content_hash"]]
+            added = sum(1 for c in changed if c.id not in stored_hashes)
+            stats["added"] += added
+            stats["updated"] += len(changed) - added
+            stats["unchanged"] += len(batch) - len(changed)
+
+            if changed:
+                # back-pressure: don't read further ahead than the embedder can keep up with
+                while len(pending) >= max_in_flight:
+                    pending.popleft().result()
+                pending.append(executor.submit(upsert, changed))
+            if progress:
+                progress(len(seen), time.perf_counter() - began)
+        while pending:
+            pending.popleft().result()
+
+    # pre-upgrade chunks have random ids and end up here too
+    orphans = []
+    offset = 0
+    while True:
+        page = vector_store.get(limit=1000, offset=offset, include=[])["ids"]
+        if not page:
+            break
+        orphans.extend(id_ for id_ in page if id_ not in seen)
+        offset += len(page)
+    for batch in batched(orphans, 1000):
+        vector_store.delete(ids=batch)
+    stats["deleted"] = len(orphans)
+    return stats
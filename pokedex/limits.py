@@ -0,0 +1,89 @@
+import asyncio
+
+
+class Saturated(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class ConcurrencyLimiter:
+    # at most max_concurrent holders, at most max_waiting queued behind them;
+    # anything beyond that is rejected immediately instead of piling up
+    def __init__(self, max_concurrent=4, max_waiting=16, wait_timeout=10.0):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._sem = asyncio.Semaphore(max_concurrent)
+        self.waiting = 0
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self._sem.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Saturated(429, "Too many pending questions, try again shortly.")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Saturated(503, "Pokédex is busy, try again shortly.")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    async def try_acquire(self):
+        # a slot only if one is free right now and nobody is queued for it; extra batch
+        # workers use this so they never wait ahead of interactive /ask requests
+        if self._sem.locked() or self.waiting:
+            return False
+        await self._sem.acquire()  # a free slot is taken without suspending
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._sem.release()
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class SlotGuard:
+    # one acquired limiter slot, released exactly once by whichever exit path gets there first
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.held = True
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.limiter.release()
+
+
+async def iterate_until(aiterable, deadline):
+    # re-yield an async stream, raising TimeoutError once the loop clock passes deadline;
+    # the upstream iterator is always closed so the generation is cancelled with it
+    loop = asyncio.get_running_loop()
+    it = aiterable.__aiter__()
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            try:
+                item = await asyncio.wait_for(it.__anext__(), remaining)
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(it, "aclose", None)
+        if aclose is not None:
+            await aclose()
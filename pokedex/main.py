@@ -3,34 +3,23 @@ import pyfiglet
 
 # for db
 from langchain_chroma import Chroma
-from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from indexer import iter_chunks, sync_chunks, bump_index_version, new_index_version, read_index_version
+from embeddings import build_embeddings
 
 # for io
-import mysql.connector
-import json
-from operator import itemgetter
-from langchain.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM, OllamaEmbeddings
-from langchain_core.messages import AIMessage, HumanMessage
+from data import fetch_rows, iter_rows
+from router import RoutedRetriever, SpeciesIndex
+from retrieval import build_retriever
+from prompting import build_assembler, prompt_template
+from history import MemoryHistoryStore
+from entries import build_entry_store, generate_entries
+from batch import run_batch
+from ollama_pool import PooledEmbeddings, build_pool
 from langchain_core.output_parsers.string import StrOutputParser
 from dotenv import load_dotenv
 import os
-from urllib.parse import quote_plus
 
 load_dotenv(override=True)  # Load environment variables from .env file
-# Connection to MySQL DB
-conn = mysql.connector.connect(
-    host= os.getenv('DB_HOST'     , None),
-    user= os.getenv('DB_NAME', None),
-    password= quote_plus(os.getenv('DB_PASSWORD'     , None)),
-    database= os.getenv('DB_NAME'     , None)
-)
-cursor = conn.cursor(dictionary=True)
-cursor.execute("SELECT * FROM Pokemon")
-rows = cursor.fetchall()
-cursor.close()
-conn.close()
 
 # global for easy changes
 db_dir = os.getenv('DB_DIRECTORY'     , None)
@@ -38,118 +27,81 @@ collection = os.getenv('COLLECTION_NAME'     , None)
 llm_model = os.getenv('LLM_MODEL_NAME'     , None)
 model_name = os.getenv('EMBEDDING_MODEL_NAME'     , None)
 
-# load data to db (to rerun please remove DB_DIRECTORY)
+# load data to db (safe to rerun: only new or changed chunks get embedded)
 def db():
-    embedding_model = OllamaEmbeddings(model=model_name)
+    pool = build_pool(embedding_model=model_name)
+    embedding_model = build_embeddings(model_name, base=PooledEmbeddings(pool))
     vector_store = Chroma(
         collection_name=collection,
         persist_directory=db_dir,
         embedding_function=embedding_model
     )
 
-    # Converting rows into LangChain Documents
-    docs = []
-    for row in rows:
-        content = f"""
-        Name: {row['name']}
-        Dex ID: {row['id']}
-        Types: {json.loads(row['types'])}
-        Abilities: {json.loads(row['abilities'])}
-        Height: {row['height']} m
-        Weight: {row['weight']} kg
-        Base Stats: {json.loads(row['base_stats'])}
-        Moves: {json.loads(row['moves'])}
-        Cry URL: {row['cry_url']}
-        """
-        doc = Document(page_content=content, metadata={"source": f"pokemon:{row['id']}"})
-        docs.append(doc)
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
+    # rows -> Documents -> chunks with stable ids, streamed from the DB cursor in batches
+    def progress(done, elapsed):
+        print(f"db: {done} chunks synced ({done / elapsed:.1f} chunks/sec)", end="\r", flush=True)
+
+    stats = sync_chunks(
+        vector_store,
+        iter_chunks(iter_rows(int(os.getenv('INDEX_PAGE_SIZE', 500)))),
+        batch_size=int(os.getenv('INDEX_BATCH_SIZE', 64)),
+        max_in_flight=int(os.getenv('INDEX_MAX_IN_FLIGHT', 2)),
+        progress=progress
+    )
+    print()
+    if stats['added'] or stats['updated'] or stats['deleted']:
+        # export before bumping, so nothing sees the new version next to the old matrix
+        version = new_index_version()
+        if os.getenv('RETRIEVAL_MODE') == 'matrix':
+            export(vector_store, version)
+        bump_index_version(db_dir, version)
+    print(
+        f"db: {stats['added']} added, {stats['updated']} updated, "
+        f"{stats['unchanged']} unchanged, {stats['deleted']} deleted."
     )
 
-    # Split into chunks
-    chunks = splitter.split_documents(docs)
-    print("db: Data cleaned and splitted into consistent chunks.")
+    emb = embedding_model.stats()
+    print(
+        f"db: embedded {emb['embedded']} texts at {emb['texts_per_sec']:.1f} texts/sec, "
+        f"cache hit rate {emb['cache_hit_rate']:.0%}."
+    )
 
-    vector_store.add_documents(chunks)
-    print(f"db: {len(chunks)} chunks added in vector store.")
+# dump the collection to the memory-mapped matrix used by RETRIEVAL_MODE=matrix
+def export(vector_store, version):
+    from matrix_index import export_matrix, matrix_dir
+    dtype = os.getenv('MATRIX_DTYPE', 'float32')  # float32 | float16 | int8
+    count, nbytes = export_matrix(vector_store, matrix_dir(db_dir), dtype, version)
+    print(f"matrix: exported {count} vectors as {dtype} ({nbytes / 2**20:.1f} MiB).")
+
+def matrix():
+    vector_store = Chroma(
+        collection_name=collection,
+        persist_directory=db_dir,
+        embedding_function=build_embeddings(model_name)
+    )
+    export(vector_store, read_index_version(db_dir))
 
 # make questions to ai actuall rag
 def io():
-    embedding_model = OllamaEmbeddings(model=model_name)
+    pool = build_pool(llm_model, model_name)
+    print("io: models loaded." if pool.warm() else "io: warm-up failed, first answer may be slow.")
+    embedding_model = build_embeddings(model_name, base=PooledEmbeddings(pool))
     vector_store = Chroma(
         collection_name=collection,
         persist_directory=db_dir,
         embedding_function=embedding_model
     )
-    retriever = vector_store.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": 4}
-    )
-
-    prompt = """
-    You are a Pokédex — a highly intelligent, encyclopedic database of all known Pokémon from the Pokémon universe. Your role is to provide comprehensive, clear, and accurate information about any Pokémon when asked.
-
-    When a Pokémon name is provided, respond with the following structured format:
-
-    Name:
-    National Dex Number:
-    Type(s):
-    Species:
-    Height:
-    Weight:
-    Abilities:
-    Base Stats (HP / Atk / Def / Sp. Atk / Sp. Def / Speed):
-    Evolutions:
-    Habitat/Location:
-    Notable Moves (Level-Up, TM/TR, Egg, Tutor):
-    Pokédex Entry (Flavored Description):
-    Fun Fact / Trivia:
-
-    Additional Guidelines:
-    - Keep entries concise yet rich in detail.
-    - Use accurate Pokémon data up to Generation IX (Scarlet & Violet), unless instructed otherwise.
-    - If a Pokémon has regional forms (e.g., Alolan, Galarian), list them too.
-    - Avoid speculation — stick to canonical information.
-    - Format the information clearly using headings and bullet points when helpful.
-    - If the input is vague (e.g., "fire starters"), ask clarifying questions or list matching Pokémon.
-    - Your tone should be informative and friendly, much like a real Pokédex would sound in the games or anime.
-
-    Context:
-    {context}
-
-    History:
-    {history}
-
-    Question:
-    {question}
-    """
-
-    prompt_template = PromptTemplate(
-        input_variables=["context", "question", "history"],
-        template=prompt
-    )
-
-    llm = OllamaLLM(
-        model=llm_model,
-        temperature=0.0,
-        streaming=True
+    # the species router is the only part of io that needs MySQL
+    retriever = RoutedRetriever(
+        species_index=SpeciesIndex(fetch_rows()) if os.getenv('ROUTER_ENABLED', '1') == '1' else None,
+        fallback=build_retriever(vector_store, db_dir)
     )
 
-    chain = (
-        {
-            "context": itemgetter("question") | retriever,
-            "question": itemgetter("question"),
-            "history": itemgetter("history")
-        }
-        | prompt_template
-        | llm
-        | StrOutputParser()
-    )
+    chain = prompt_template | pool.pick().llm | StrOutputParser()
 
-    history = []
+    # prompt size is bounded by the assembler's token budget, not a message count
+    assembler = build_assembler()
+    history = MemoryHistoryStore()
     while True:
         q = input("ask > ")
         if q.strip().lower() == 'q':
@@ -157,18 +109,58 @@ def io():
             break
 
         output = ""
+        docs = retriever.invoke(q)
+        inputs, _ = assembler.assemble(q, docs, history.get("cli"))
 
-        # avoid errors for the prompt size of llm
-        if len(history) > 10:
-            history = history[-10:]
-
-        for token in chain.stream({"question": q, "history": history}):
+        for token in chain.stream(inputs):
             print(token, end="", flush=True)
             output += token
         print("\n")
 
-        history.append(HumanMessage(content=q))
-        history.append(AIMessage(content=output))
+        history.append("cli", q, output)
+
+# generate every Pokédex entry offline (only changed ones on rerun)
+def entries():
+    pool = build_pool(llm_model=llm_model)
+    pool.warm()
+    generate_entries(
+        SpeciesIndex(fetch_rows()),
+        pool,
+        build_entry_store(),
+        build_assembler(),
+        llm_model,
+        workers=int(os.getenv('ENTRY_WORKERS', 2 * len(pool.backends))),
+        force='--force' in sys.argv
+    )
+
+# answer a file of questions (one per line) in one batch, NDJSON lines as they finish
+def batch():
+    path = sys.argv[2]
+    out_path = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(path)[0] + ".answers.ndjson"
+    with open(path) as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    pool = build_pool(llm_model, model_name)
+    print("batch: models loaded." if pool.warm() else "batch: warm-up failed, first answers may be slow.")
+    embedding_model = build_embeddings(model_name, base=PooledEmbeddings(pool))
+    vector_store = Chroma(
+        collection_name=collection,
+        persist_directory=db_dir,
+        embedding_function=embedding_model
+    )
+    retriever = RoutedRetriever(
+        species_index=SpeciesIndex(fetch_rows()) if os.getenv('ROUTER_ENABLED', '1') == '1' else None,
+        fallback=build_retriever(vector_store, db_dir)
+    )
+
+    with open(out_path, "w") as out:
+        for line in run_batch(
+            questions, retriever, embedding_model, pool, build_assembler(),
+            workers=int(os.getenv('BATCH_WORKERS', 2 * len(pool.backends)))
+        ):
+            out.write(line)
+            out.flush()
+    print(f"batch: answers written to {out_path}")
 
 def main():
     try:
@@ -178,13 +170,22 @@ def main():
             print(ascii_banner)
 
             io()
+        elif run.strip().lower() == 'matrix':
+            matrix()
+        elif run.strip().lower() == 'batch':
+            batch()
+        elif run.strip().lower() == 'entries':
+            ascii_banner = pyfiglet.figlet_format("rag v1 - entries")
+            print(ascii_banner)
+
+            entries()
         else:
             ascii_banner = pyfiglet.figlet_format("rag v1 - db")
             print(ascii_banner)
 
             db()
     except IndexError as e:
-        print("try: python main.py [db|io]")
+        print("try: python main.py [db|io|entries|matrix|batch <questions file> [answers file]]")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
+from pydantic import PrivateAttr
+
+from filters import matches
+from indexer import read_index_version
+
+DTYPES = ("float32", "float16", "int8")
+
+logger = logging.getLogger("pokedex.matrix")
+
+
+def matrix_dir(db_dir):
+    return os.path.join(db_dir, "matrix")
+
+
+def current_export(directory):
+    # name of the published export, or "" for the flat layout of older exports
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def publish(directory, name):
+    # one atomic pointer swap makes all three files of an export visible together
+    tmp = os.path.join(directory, "CURRENT.tmp")
+    with open(tmp, "w") as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(directory, "CURRENT"))
+    # keep the previous export for workers still switching over; older ones go
+    # (newer names may be another export still being written)
+    older = sorted(e for e in os.listdir(directory) if e.startswith("export-") and e < name)
+    for entry in older[:-1]:
+        shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+def normalize(vectors):
+    # unit rows: dot product == cosine, and the ranking matches Chroma's l2 on normalized data
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize(vectors, dtype):
+    # int8 is symmetric per row; the per-row scale is stored next to the matrix
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(dtype), np.ones(len(vectors), dtype=np.float32)
+
+
+def export_matrix(vector_store, directory, dtype="float32", version=None, page_size=1000):
+    # Chroma collection -> matrix.npy (memory-mappable, in `dtype`) + scales.npy + docs.json,
+    # written to a fresh export-<ns>/ directory and then published via CURRENT
+    if dtype not in DTYPES:
+        raise ValueError(f"unknown matrix dtype: {dtype}")
+    ids, texts, metas, vectors = [], [], [], []
+    offset = 0
+    while True:
+        page = vector_store.get(
+            limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"]
+        )
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        texts.extend(page["documents"])
+        metas.extend(m or {} for m in page["metadatas"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    if not ids:
+        raise ValueError("collection is empty, nothing to export")
+
+    matrix, scales = quantize(normalize(np.concatenate(vectors)), dtype)
+    name = f"export-{time.time_ns()}"
+    target = os.path.join(directory, name)
+    os.makedirs(target)
+    out = np.lib.format.open_memmap(os.path.join(target, "matrix.npy"), mode="w+", dtype=matrix.dtype, shape=matrix.shape)
+    out[:] = matrix
+    out.flush()
+    del out
+    with open(os.path.join(target, "scales.npy"), "wb") as f:
+        np.save(f, scales)
+    with open(os.path.join(target, "docs.json"), "w") as f:
+        json.dump({"version": version, "dtype": dtype, "ids": ids, "texts": texts, "metadatas": metas}, f)
+    # workers that already mapped the old matrix keep reading it until they see CURRENT move
+    publish(directory, name)
+    return len(ids), matrix.nbytes
+
+
+class MatrixIndex:
+    # exact top-k over a read-only memory-mapped matrix; the OS page cache is
+    # shared, so every worker process mapping the same file holds one copy
+    def __init__(self, directory, block_rows=4096):
+        with open(os.path.join(directory, "docs.json")) as f:
+            meta = json.load(f)
+        self.version = meta["version"]
+        self.dtype = meta["dtype"]
+        self.ids = meta["ids"]
+        self.texts = meta["texts"]
+        self.metadatas = meta["metadatas"]
+        self.matrix = np.load(os.path.join(directory, "matrix.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(directory, "scales.npy"))
+        self.block_rows = block_rows
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, queries):
+        # (q, n) cosine scores, computed a block of rows at a time so a float16/int8
+        # matrix is only ever upcast one block at once
+        queries = normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        out = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), self.block_rows):
+            block = np.asarray(self.matrix[start:start + self.block_rows], dtype=np.float32)
+            out[:, start:start + len(block)] = queries @ block.T * self.scales[start:start + len(block)]
+        return out
+
+    def top_k(self, queries, k, filter=None):
+        scores = self.scores(queries)
+        if filter is not None:
+            mask = np.fromiter((matches(m, filter) for m in self.metadatas), dtype=bool, count=len(self.ids))
+            scores[:, ~mask] = -np.inf
+        k = min(k, scores.shape[1])
+        results = []
+        for row in scores:
+            best = np.argpartition(-row, k - 1)[:k]
+            best = best[np.argsort(-row[best])]
+            results.append([(int(i), float(row[i])) for i in best if row[i] != -np.inf])
+        return results
+
+    def document(self, i):
+        return Document(id=self.ids[i], page_content=self.texts[i], metadata=self.metadatas[i])
+
+
+class MatrixRetriever(BaseRetriever):
+    # drop-in for the Chroma similarity retriever (RETRIEVAL_MODE=matrix);
+    # remaps the exported files whenever a new export is published
+    embeddings: Any
+    directory: str
+    db_dir: Any = None
+    k: int = 4
+    _index: Any = None
+    _export: Any = None
+    _checked_version: Any = None
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def sync(self):
+        export = current_export(self.directory)
+        version = read_index_version(self.db_dir)
+        if self._index is not None and export == self._export and version == self._checked_version:
+            return self._index
+        with self._lock:
+            if self._index is None or export != self._export:
+                self._index = MatrixIndex(os.path.join(self.directory, export) if export else self.directory)
+                self._export = export
+            if version != self._checked_version:
+                self._checked_version = version
+                if self._index.version != version:
+                    logger.warning("matrix export is stale, re-run `python main.py matrix`")
+        return self._index
+
+    def search_vectors(self, vectors, k=None, filter=None):
+        index = self.sync()
+        return [
+            [index.document(i) for i, _ in hits]
+            for hits in index.top_k(vectors, k or self.k, filter)
+        ]
+
+    def _get_relevant_documents(self, query, *, run_manager=None, filter=None):
+        return self.search_vectors([self.embeddings.embed_query(query)], filter=filter)[0]
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None, filter=None):
+        return await run_in_executor(None, self._get_relevant_documents, query, filter=filter)
@@ -0,0 +1,144 @@
+import logging
+import os
+import re
+import sys
+import threading
+from collections import Counter as _Counter
+
+# shared by both services: imported as `metrics` here and as `pokedex.metrics` by
+# poke_app, so keep this module free of imports from the rest of the RAG service
+
+logger = logging.getLogger("pokedex.metrics")
+
+MS_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+RATE_BUCKETS = (1, 2.5, 5, 10, 20, 40, 80, 160, 320, 640)
+# incoming X-Request-ID values are kept only if safe to log and to use as a filename
+REQUEST_ID = re.compile(r"^[\w.-]{1,64}$")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+
+class Histogram:
+    # cumulative buckets in the Prometheus text format, one series per label set;
+    # per process, so scrape every worker
+    def __init__(self, name, help, buckets=MS_BUCKETS, labels=()):
+        self.name, self.help, self.buckets, self.label_names = name, help, buckets, labels
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            counts, sum_, n = self._series.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, sum_ + value, n + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(c), s, n) for k, (c, s, n) in self._series.items()}
+        for key, (counts, sum_, n) in sorted(series.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), key + (bound,))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), key + ('+Inf',))} {n}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {sum_}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {n}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Gauge:
+    # read at scrape time from whatever already tracks the value
+    def __init__(self, name, help, read):
+        self.name, self.help, self.read = name, help, read
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning("metric %s failed: %s", metric.name, e)
+        return "\n".join(lines) + "\n"
+
+
+class Sampler:
+    # poor man's sampling profiler: snapshots stacks every `interval` seconds and writes
+    # collapsed stacks (flamegraph.pl / speedscope input). With a thread id only that
+    # thread is sampled; without one every other thread is, each stack rooted at its
+    # thread name
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = _Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _frames(self):
+        frames = sys._current_frames()
+        if self.thread_id is not None:
+            frame = frames.get(self.thread_id)
+            return [(None, frame)] if frame is not None else []
+        names = {t.ident: t.name for t in threading.enumerate()}
+        return [(names.get(ident, str(ident)), frame) for ident, frame in frames.items() if ident != self._thread.ident]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for thread_name, frame in self._frames():
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if thread_name is not None:
+                    stack.append(thread_name)
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self, path):
+        self._stop.set()
+        self._thread.join()
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_ollama import OllamaEmbeddings, OllamaLLM
+from ollama import Client
+
+logger = logging.getLogger("pokedex.ollama")
+
+
+def model_tag(name):
+    # ollama reports "mistral" as "mistral:latest"
+    return name if ":" in name else f"{name}:latest"
+
+
+def parse_keep_alive(value):
+    # ollama takes seconds (-1 = forever) or a duration string like "30m"
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class OllamaBackend:
+    # one Ollama host with long-lived, pooled clients for generation and embeddings
+    def __init__(self, base_url, llm_model, embedding_model, keep_alive, max_connections=16, timeout=300):
+        self.base_url = base_url
+        self.llm_model = llm_model
+        self.embedding_model = embedding_model
+        self.keep_alive = keep_alive
+        client_kwargs = {
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            "timeout": httpx.Timeout(timeout, connect=5.0),
+        }
+        self.llm = OllamaLLM(
+            model=llm_model,
+            base_url=base_url,
+            temperature=0.0,
+            streaming=True,
+            keep_alive=keep_alive,
+            client_kwargs=client_kwargs
+        ) if llm_model else None
+        self.embeddings = OllamaEmbeddings(
+            model=embedding_model,
+            base_url=base_url,
+            keep_alive=keep_alive,
+            client_kwargs=client_kwargs
+        ) if embedding_model else None
+        self._client = Client(host=base_url, **client_kwargs)
+        self.in_flight = 0
+        self.ready = False
+        self.error = None
+        self.warmed_at = None
+
+    def warm(self):
+        # an empty generate / a one-word embed loads the model and pins it for keep_alive
+        try:
+            if self.llm_model:
+                self._client.generate(model=self.llm_model, prompt="", keep_alive=self.keep_alive)
+            if self.embedding_model:
+                self._client.embed(model=self.embedding_model, input="warmup", keep_alive=self.keep_alive)
+            self.ready, self.error, self.warmed_at = True, None, time.time()
+        except Exception as e:
+            self.ready, self.error = False, str(e)
+        return self.ready
+
+    def check(self):
+        # cheap liveness probe: a host that is down flips to not ready, one that is up
+        # but never warmed or lost its models (restart, eviction) is warmed again
+        try:
+            loaded = {m.model for m in self._client.ps().models}
+        except Exception as e:
+            self.ready, self.error = False, str(e)
+            return False
+        wanted = {model_tag(m) for m in (self.llm_model, self.embedding_model) if m}
+        if not self.ready or not wanted <= loaded:
+            return self.warm()
+        return True
+
+    def status(self):
+        return {
+            "base_url": self.base_url,
+            "ready": self.ready,
+            "in_flight": self.in_flight,
+            "error": self.error,
+            "warmed_at": self.warmed_at,
+        }
+
+
+class FakeBackend:
+    # LLM_BACKEND=fake: no Ollama at all, for benchmarks and offline runs
+    def __init__(self, ttft, tokens_per_sec):
+        from embeddings import FakeEmbeddings
+        from fake_llm import FakeLLM
+        self.base_url = "fake://"
+        self.llm = FakeLLM(ttft=ttft, tokens_per_sec=tokens_per_sec)
+        self.embeddings = FakeEmbeddings()
+        self.in_flight = 0
+        self.ready = True
+
+    def warm(self):
+        return True
+
+    def check(self):
+        return True
+
+    def status(self):
+        return {"base_url": self.base_url, "ready": True, "in_flight": self.in_flight, "error": None, "warmed_at": None}
+
+
+class OllamaPool:
+    # least-loaded routing over several Ollama hosts
+    def __init__(self, backends):
+        self.backends = backends
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return any(b.ready for b in self.backends)
+
+    def warm(self):
+        threads = [threading.Thread(target=b.warm, daemon=True) for b in self.backends]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.ready
+
+    def check(self):
+        threads = [threading.Thread(target=b.check, daemon=True) for b in self.backends]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.ready
+
+    async def monitor(self, interval=15.0):
+        # warm once, then re-probe every `interval` seconds so hosts that start late,
+        # fail warm-up or die later change `ready` without a restart
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.warm)
+        while True:
+            await asyncio.sleep(interval)
+            was_ready = [b.ready for b in self.backends]
+            await loop.run_in_executor(None, self.check)
+            for backend, before in zip(self.backends, was_ready):
+                if backend.ready and not before:
+                    logger.info("ollama %s is ready", backend.base_url)
+                elif before and not backend.ready:
+                    logger.warning("ollama %s is down: %s", backend.base_url, backend.error)
+
+    def pick(self):
+        candidates = [b for b in self.backends if b.ready] or self.backends
+        return min(candidates, key=lambda b: b.in_flight)
+
+    @contextmanager
+    def lease(self):
+        with self._lock:
+            backend = self.pick()
+            backend.in_flight += 1
+        try:
+            yield backend
+        finally:
+            with self._lock:
+                backend.in_flight -= 1
+
+    def status(self):
+        return {"ready": self.ready, "backends": [b.status() for b in self.backends]}
+
+
+class PooledEmbeddings(Embeddings):
+    def __init__(self, pool):
+        self.pool = pool
+
+    def embed_documents(self, texts):
+        with self.pool.lease() as backend:
+            return backend.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        with self.pool.lease() as backend:
+            return backend.embeddings.embed_query(text)
+
+
+def build_pool(llm_model=None, embedding_model=None):
+    if os.getenv("LLM_BACKEND", "ollama") == "fake":
+        return OllamaPool([FakeBackend(
+            ttft=float(os.getenv("FAKE_LLM_TTFT", 0.05)),
+            tokens_per_sec=float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", 200))
+        )])
+    hosts = os.getenv("OLLAMA_HOSTS") or os.getenv("OLLAMA_HOST") or "http://localhost:11434"
+    keep_alive = parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "-1"))
+    max_connections = int(os.getenv("OLLAMA_MAX_CONNECTIONS", 16))
+    timeout = float(os.getenv("OLLAMA_TIMEOUT", 300))
+    return OllamaPool([
+        OllamaBackend(host.strip(), llm_model, embedding_model, keep_alive, max_connections, timeout)
+        for host in hosts.split(",") if host.strip()
+    ])
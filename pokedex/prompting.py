@@ -0,0 +1,220 @@
+import logging
+import os
+import re
+
+from langchain.prompts import PromptTemplate
+from langchain_core.messages import HumanMessage
+
+from tokens import count_tokens
+
+logger = logging.getLogger("pokedex.prompt")
+
+# Prompt
+SYSTEM_PROMPT = """
+You are a Pokédex — a highly intelligent, encyclopedic database of all known Pokémon from the Pokémon universe. Your role is to provide comprehensive, clear, and accurate information about any Pokémon when asked.
+
+When a Pokémon name is provided, respond with the following structured format:
+
+Name:
+National Dex Number:
+Type(s):
+Species:
+Height:
+Weight:
+Abilities:
+Base Stats (HP / Atk / Def / Sp. Atk / Sp. Def / Speed):
+Evolutions:
+Habitat/Location:
+Notable Moves (Level-Up, TM/TR, Egg, Tutor):
+Pokédex Entry (Flavored Description):
+Fun Fact / Trivia:
+
+Additional Guidelines:
+- Keep entries concise yet rich in detail.
+- Use accurate Pokémon data up to Generation IX (Scarlet & Violet), unless instructed otherwise.
+- If a Pokémon has regional forms (e.g., Alolan, Galarian), list them too.
+- Avoid speculation — stick to canonical information.
+- Format the information clearly using headings and bullet points when helpful.
+- If the input is vague (e.g., "fire starters"), ask clarifying questions or list matching Pokémon.
+- Your tone should be informative and friendly, much like a real Pokédex would sound in the games or anime.
+"""
+
+prompt = SYSTEM_PROMPT + """
+Context:
+{context}
+
+History:
+{history}
+
+Question:
+{question}
+"""
+
+prompt_template = PromptTemplate(
+    input_variables=["context", "question", "history"],
+    template=prompt
+)
+
+# record fields as written by indexer.row_to_document
+FIELDS = ["Name", "Dex ID", "Types", "Abilities", "Height", "Weight", "Base Stats", "Moves", "Cry URL"]
+ALWAYS = {"Name", "Dex ID", "Types"}
+FIELD_KEYWORDS = {
+    "Abilities": ["abilit"],
+    "Base Stats": ["stat", "hp", "attack", "defen", "speed", "strong", "bst", "fast"],
+    "Moves": ["move", "learn", "tm", "tutor", "attack"],
+    "Height": ["height", "tall", "size", "big", "small"],
+    "Weight": ["weight", "heavy", "light", "size"],
+    "Cry URL": ["cry", "sound"],
+}
+FIELD_LINE = re.compile(r"^\s*(" + "|".join(re.escape(f) for f in FIELDS) + r"):\s*(.*)$")
+
+
+def merge_overlap(a, b, min_overlap=20):
+    # splitter chunks of one record overlap; glue b onto a without the repeated part
+    if b in a:
+        return a
+    for size in range(min(len(a), len(b)), min_overlap - 1, -1):
+        if a.endswith(b[:size]):
+            return a + b[size:]
+    return a + "\n" + b
+
+
+def dedupe_documents(docs):
+    # one text per source, chunks merged in order, sources kept in retrieval rank order
+    by_source, order = {}, []
+    for doc in docs:
+        source = doc.metadata.get("source", id(doc))
+        if source not in by_source:
+            by_source[source] = []
+            order.append(source)
+        by_source[source].append(doc)
+
+    texts = []
+    for source in order:
+        chunks = sorted(by_source[source], key=lambda d: d.metadata.get("chunk", 0))
+        text, seen = "", set()
+        for chunk in chunks:
+            if chunk.page_content in seen:
+                continue
+            seen.add(chunk.page_content)
+            text = merge_overlap(text, chunk.page_content.strip()) if text else chunk.page_content.strip()
+        texts.append(text)
+    return texts
+
+
+def relevant_fields(question):
+    q = question.lower()
+    wanted = {field for field, words in FIELD_KEYWORDS.items() if any(w in q for w in words)}
+    if not wanted:
+        # a full entry: everything but the cry link
+        return set(FIELDS) - {"Cry URL"}
+    return wanted | ALWAYS
+
+
+def compact(text, fields):
+    # lines before the first field header belong to a field we can't name (a chunk
+    # starting mid-record) and are dropped; text without any headers passes through
+    out, keep, labelled = [], False, False
+    for line in text.splitlines():
+        match = FIELD_LINE.match(line)
+        if match:
+            keep, labelled = match.group(1) in fields, True
+            line = f"{match.group(1)}: {match.group(2)}"
+        elif not line.strip():
+            continue
+        if keep:
+            out.append(line.strip())
+    if not labelled:
+        return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+    return "\n".join(out)
+
+
+def truncate_tokens(text, budget):
+    if count_tokens(text) <= budget:
+        return text
+    words, out, used = text.split(" "), [], 0
+    for word in words:
+        cost = count_tokens(word)
+        if used + cost > budget:
+            break
+        out.append(word)
+        used += cost
+    return " ".join(out) + " …"
+
+
+def format_turns(messages):
+    lines = []
+    for m in messages:
+        role = "User" if isinstance(m, HumanMessage) else "Pokédex"
+        lines.append(f"{role}: {m.content}")
+    return "\n".join(lines)
+
+
+class PromptAssembler:
+    # fits system prompt + context + history + question into a fixed token budget
+    def __init__(self, budget=3000, history_share=0.25):
+        self.budget = budget
+        self.history_share = history_share
+        self.system_tokens = count_tokens(SYSTEM_PROMPT)
+
+    def _history(self, messages, budget):
+        # newest turns verbatim, older ones collapsed into a one-line summary
+        pairs = [messages[i:i + 2] for i in range(0, len(messages), 2)]
+        kept, used = [], 0
+        for pair in reversed(pairs):
+            text = format_turns(pair)
+            cost = count_tokens(text)
+            if used + cost > budget:
+                break
+            kept.insert(0, text)
+            used += cost
+        dropped = pairs[:len(pairs) - len(kept)]
+        if dropped:
+            asked = "; ".join(p[0].content[:60] for p in dropped)
+            summary = truncate_tokens(f"Earlier the user asked about: {asked}", max(budget - used, 0))
+            if summary.strip(" …"):
+                kept.insert(0, summary)
+        return "\n".join(kept)
+
+    def assemble(self, question, docs, history):
+        question_tokens = count_tokens(question)
+        available = max(self.budget - self.system_tokens - question_tokens, 0)
+
+        history_budget = int(available * self.history_share)
+        history_text = self._history(history, history_budget)
+        history_tokens = count_tokens(history_text)
+
+        # whatever history didn't use goes to context
+        context_budget = available - history_tokens
+        fields = relevant_fields(question)
+        parts, used = [], 0
+        for text in dedupe_documents(docs):
+            text = compact(text, fields)
+            cost = count_tokens(text)
+            if used + cost > context_budget:
+                remaining = context_budget - used
+                if remaining > 20:
+                    parts.append(truncate_tokens(text, remaining))
+                break
+            parts.append(text)
+            used += cost
+        context_text = "\n\n".join(parts)
+
+        breakdown = {
+            "system": self.system_tokens,
+            "context": count_tokens(context_text),
+            "history": history_tokens,
+            "question": question_tokens,
+            "docs_in": len(docs),
+            "records_out": len(parts),
+        }
+        breakdown["total"] = breakdown["system"] + breakdown["context"] + breakdown["history"] + breakdown["question"]
+        logger.info("prompt tokens %s", breakdown)
+        return {"context": context_text, "history": history_text, "question": question}, breakdown
+
+
+def build_assembler():
+    return PromptAssembler(
+        budget=int(os.getenv("PROMPT_TOKEN_BUDGET", 3000)),
+        history_share=float(os.getenv("PROMPT_HISTORY_SHARE", 0.25)),
+    )
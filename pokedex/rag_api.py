@@ -1,26 +1,60 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
-from langchain_ollama import OllamaLLM, OllamaEmbeddings
 from langchain_chroma import Chroma
-from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers.string import StrOutputParser
-from operator import itemgetter
 from dotenv import load_dotenv
 import os
-from langchain_core.messages import HumanMessage, AIMessage
+import logging
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from embeddings import build_embeddings
+from answer_cache import AnswerCache, context_fingerprint, replay
+from indexer import read_index_version
+from history import build_history_store
+from limits import ConcurrencyLimiter, Saturated, SlotGuard, iterate_until
+from router import RoutedRetriever, SpeciesIndex
+from retrieval import build_retriever
+from filters import extract_filter, parse_filter
+from batch import group_jobs, infer_filters, result_lines, retrieve_batch
+from prompting import build_assembler, prompt_template
+from ollama_pool import PooledEmbeddings, build_pool
+from contextlib import asynccontextmanager, suppress
+from entries import build_entry_store, data_hash, prompt_hash
+from data import fetch_rows
+from tokens import count_tokens
+from tracing import Gauge, TracingMiddleware, annotate, answers_total, registry, span, tokens_per_sec, ttft_ms
+import asyncio
+import time
+import uuid
 
 load_dotenv(override=True)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'))
+logger = logging.getLogger("pokedex.api")
 
 # CONFIG
 db_dir = os.getenv('DB_DIRECTORY')
 collection = os.getenv('COLLECTION_NAME')
 llm_model = os.getenv('LLM_MODEL_NAME')
 model_name = os.getenv('EMBEDDING_MODEL_NAME')
+semantic_threshold = os.getenv('ANSWER_CACHE_SEMANTIC_THRESHOLD')
+
+# Ollama hosts (OLLAMA_HOSTS=url1,url2,...), warmed at startup and routed least-loaded
+ollama_pool = build_pool(llm_model, model_name)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # warm and health-check in the background; /ready reports when the models are resident
+    monitor = asyncio.create_task(ollama_pool.monitor(float(os.getenv('OLLAMA_HEALTH_INTERVAL', 15))))
+    yield
+    monitor.cancel()
+    with suppress(asyncio.CancelledError):
+        await monitor
+
 
 # FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,97 +62,337 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+# X-Request-ID in/out, per-stage spans logged on "pokedex.trace", optional X-Profile sampling
+app.add_middleware(TracingMiddleware)
 
-# In-memory history store (you can improve this later with session support)
-history = []
+# Per-session history, bounded by HISTORY_MAX_TOKENS (memory or sqlite backend)
+history_store = build_history_store()
+SESSION_COOKIE = "pokedex_session"
 
 # Embedding and retrieval
-embedding_model = OllamaEmbeddings(model=model_name)
+embedding_model = build_embeddings(model_name, base=PooledEmbeddings(ollama_pool))
 vector_store = Chroma(
     collection_name=collection,
     persist_directory=db_dir,
     embedding_function=embedding_model
 )
-retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 4})
-
-# Prompt
-prompt = """
-You are a Pokédex — a highly intelligent, encyclopedic database of all known Pokémon from the Pokémon universe. Your role is to provide comprehensive, clear, and accurate information about any Pokémon when asked.
-
-When a Pokémon name is provided, respond with the following structured format:
-
-Name:
-National Dex Number:
-Type(s):
-Species:
-Height:
-Weight:
-Abilities:
-Base Stats (HP / Atk / Def / Sp. Atk / Sp. Def / Speed):
-Evolutions:
-Habitat/Location:
-Notable Moves (Level-Up, TM/TR, Egg, Tutor):
-Pokédex Entry (Flavored Description):
-Fun Fact / Trivia:
-
-Additional Guidelines:
-- Keep entries concise yet rich in detail.
-- Use accurate Pokémon data up to Generation IX (Scarlet & Violet), unless instructed otherwise.
-- If a Pokémon has regional forms (e.g., Alolan, Galarian), list them too.
-- Avoid speculation — stick to canonical information.
-- Format the information clearly using headings and bullet points when helpful.
-- If the input is vague (e.g., "fire starters"), ask clarifying questions or list matching Pokémon.
-- Your tone should be informative and friendly, much like a real Pokédex would sound in the games or anime.
-
-Context:
-{context}
-
-History:
-{history}
-
-Question:
-{question}
-"""
-
-prompt_template = PromptTemplate(
-    input_variables=["context", "question", "history"],
-    template=prompt
+vector_retriever = build_retriever(vector_store, db_dir)  # RETRIEVAL_MODE=similarity|hybrid
+
+# Name / dex-number questions are answered from the full record, no embedding or ANN search
+species_index = None
+if os.getenv('ROUTER_ENABLED', '1') == '1':
+    try:
+        species_index = SpeciesIndex(fetch_rows())
+    except Exception as e:
+        logger.warning("router disabled, could not load Pokemon rows: %s", e)
+retriever = RoutedRetriever(species_index=species_index, fallback=vector_retriever)
+
+# Prompt (shared with main.py) and the token-budgeted assembler that fills it
+assembler = build_assembler()
+
+# Chain (retrieval runs first so its result can be part of the cache key);
+# the LLM is bound per request to whichever backend is least loaded
+def make_chain(backend):
+    return prompt_template | backend.llm | StrOutputParser()
+
+# Pokédex entries generated offline by `python main.py entries`
+entry_store = build_entry_store()
+entry_prompt_hash = prompt_hash(assembler)
+
+
+def materialized_entry(question):
+    # a bare single-species lookup is served from the entry store if it is current
+    ids = species_index.resolve(question) if species_index else None
+    if not ids or len(ids) != 1:
+        return None
+    row = species_index.by_id[ids[0]]
+    return entry_store.get(ids[0], llm_model, entry_prompt_hash, data_hash(row))
+
+
+# Answers are deterministic at temperature 0, so identical question + context + history + model replay
+answer_cache = AnswerCache(
+    maxsize=int(os.getenv('ANSWER_CACHE_SIZE', 1024)),
+    ttl=int(os.getenv('ANSWER_CACHE_TTL', 24 * 3600)),
+    semantic_threshold=float(semantic_threshold) if semantic_threshold else None
 )
 
-llm = OllamaLLM(model=llm_model, temperature=0.0, streaming=True)
-
-# Chain
-chain = (
-    {
-        "context": itemgetter("question") | retriever,
-        "question": itemgetter("question"),
-        "history": itemgetter("history")
-    }
-    | prompt_template
-    | llm
-    | StrOutputParser()
+# Caps concurrent generations against Ollama; extra requests queue briefly or get 429/503
+limiter = ConcurrencyLimiter(
+    max_concurrent=int(os.getenv('ASK_MAX_CONCURRENT', 4)),
+    max_waiting=int(os.getenv('ASK_MAX_QUEUE', 16)),
+    wait_timeout=float(os.getenv('ASK_QUEUE_TIMEOUT', 10))
 )
+ask_timeout = float(os.getenv('ASK_TIMEOUT', 120))
+
+# /ask/batch: questions per request, and generation workers per batch (each holds a limiter slot)
+batch_max_questions = int(os.getenv('ASK_BATCH_MAX_QUESTIONS', 64))
+batch_workers = int(os.getenv('ASK_BATCH_WORKERS', 2))
+
+registry.add(Gauge("pokedex_generations_in_flight", "Generations holding a limiter slot", lambda: limiter.in_flight))
+registry.add(Gauge("pokedex_generations_waiting", "Requests queued for a slot", lambda: limiter.waiting))
+registry.add(Gauge("pokedex_answer_cache_hit_rate", "Answer cache hit rate", lambda: answer_cache.stats()["hit_rate"]))
+registry.add(Gauge("pokedex_embedding_cache_hit_rate", "Embedding cache hit rate", lambda: embedding_model.stats()["cache_hit_rate"]))
+
+
+class GuardedStreamingResponse(StreamingResponse):
+    # releases the limiter slot however the response ends, including when the body
+    # generator never starts (client gone or task cancelled before the first chunk)
+    def __init__(self, content, slot=None, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.slot is not None:
+                self.slot.release()
+
 
 # Request schema
 class AskRequest(BaseModel):
     question: str
+    session_id: str | None = None
+    # e.g. "types contains Fire AND speed > 100"; otherwise inferred from the question
+    filter: str | None = None
+    # one-off lookups (the Flask detail page): no history is read, written or cookied
+    stateless: bool = False
 
 @app.post("/ask")
-def ask_pokedex(req: AskRequest):
-    global history
-    if len(history) > 10:
-        history = history[-10:]
+async def ask_pokedex(req: AskRequest, request: Request):
+    session_id = None if req.stateless else req.session_id or request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+
+    async def remember(answer):
+        if session_id is not None:
+            await run_in_threadpool(history_store.append, session_id, req.question, answer)
+
+    def with_session(response):
+        if session_id is not None:
+            response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+        return response
+
+    with span("entry_lookup"):
+        entry = None if req.filter else await run_in_threadpool(materialized_entry, req.question)
+    if entry is not None:
+        answers_total.inc(source="entry")
+        annotate(source="entry")
+        async def stream_entry():
+            for piece in replay(entry):
+                yield piece
+            await remember(entry)
+
+        return with_session(StreamingResponse(stream_entry(), media_type="text/plain"))
+
+    with span("history"):
+        history = await run_in_threadpool(history_store.get, session_id) if session_id is not None else []
+
+    answer_cache.sync_index_version(read_index_version(db_dir))
+    try:
+        where = parse_filter(req.filter) if req.filter else extract_filter(
+            req.question, species_index.abilities if species_index else ()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    search_kwargs = {"filter": where} if where else {}
+    with span("retrieval"):
+        docs = await retriever.ainvoke(req.question, **search_kwargs)
+    fingerprint = context_fingerprint(docs, history)
+    with span("cache_lookup"):
+        # the query embedding is already cached by the retriever call above
+        q_embedding = (
+            await run_in_threadpool(embedding_model.embed_query, req.question)
+            if answer_cache.semantic else None
+        )
+        cached = answer_cache.get(req.question, fingerprint, llm_model, q_embedding)
+    annotate(source="cache" if cached is not None else "generated", docs=len(docs))
+
+    # only live generations take a slot, cache replays never touch Ollama
+    slot = None
+    if cached is None:
+        try:
+            await limiter.acquire()
+        except Saturated as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": "1"})
+        slot = SlotGuard(limiter)
+
+    async def stream_response():
+        if cached is not None:
+            answers_total.inc(source="cache")
+            for piece in replay(cached):
+                yield piece
+            await remember(cached)
+            return
 
-    def stream_response():
         full_response = ""
-        for chunk in chain.stream({
-            "question": req.question,
-            "history": history
-        }):
-            full_response += chunk
-            yield chunk
-        history.append(HumanMessage(content=req.question))
-        history.append(AIMessage(content=full_response))
-
-    return StreamingResponse(stream_response(), media_type="text/plain")
+        deadline = asyncio.get_running_loop().time() + ask_timeout
+        try:
+            with span("prompt"):
+                inputs, _ = assembler.assemble(req.question, docs, history)
+            with span("generation"), ollama_pool.lease() as backend:
+                began = first = time.perf_counter()
+                async for chunk in iterate_until(make_chain(backend).astream(inputs), deadline):
+                    # leaving the loop closes astream, which cancels the Ollama request
+                    if await request.is_disconnected():
+                        return
+                    if chunk and not full_response:
+                        first = time.perf_counter()
+                        ttft_ms.observe((first - began) * 1000)
+                    full_response += chunk
+                    yield chunk
+                streamed = time.perf_counter() - first
+                if streamed > 0:
+                    tokens_per_sec.observe(count_tokens(full_response) / streamed)
+        except asyncio.TimeoutError:
+            yield "\n\n[Pokédex entry timed out]"
+            return
+        finally:
+            # free the slot as soon as generation ends; the response releases it otherwise
+            slot.release()
+
+        answers_total.inc(source="generated")
+
+        answer_cache.put(req.question, fingerprint, llm_model, full_response, q_embedding)
+        await remember(full_response)
+
+    return with_session(GuardedStreamingResponse(stream_response(), slot=slot, media_type="text/plain"))
+
+
+class AskBatchRequest(BaseModel):
+    questions: list[str]
+    # applied to every question; otherwise inferred per question
+    filter: str | None = None
+
+@app.post("/ask/batch")
+async def ask_pokedex_batch(req: AskBatchRequest):
+    # NDJSON, one {"index", "question", "answer" | "error", "source"} line per question
+    # as each finishes; stateless, so no session history is read or written
+    questions = [q.strip() for q in req.questions]
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="questions must be a non-empty list of non-empty strings.")
+    if len(questions) > batch_max_questions:
+        raise HTTPException(status_code=400, detail=f"at most {batch_max_questions} questions per batch.")
+    try:
+        wheres = [parse_filter(req.filter)] * len(questions) if req.filter else infer_filters(questions, species_index)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    answer_cache.sync_index_version(read_index_version(db_dir))
+    with span("retrieval"):
+        docs = await run_in_threadpool(retrieve_batch, retriever, embedding_model, questions, wheres)
+
+    replayed, todo = [], []
+    with span("cache_lookup"):
+        for indices in group_jobs(questions, docs):
+            q = questions[indices[0]]
+            entry = None if req.filter else await run_in_threadpool(materialized_entry, q)
+            if entry is not None:
+                answers_total.inc(source="entry")
+                replayed.extend(result_lines(questions, indices, answer=entry, source="entry"))
+                continue
+            cached = answer_cache.get(q, context_fingerprint(docs[indices[0]]), llm_model)
+            if cached is not None:
+                answers_total.inc(source="cache")
+                replayed.extend(result_lines(questions, indices, answer=cached, source="cache"))
+                continue
+            todo.append(indices)
+    annotate(source="batch", questions=len(questions), generations=len(todo))
+
+    # the first worker's slot is taken up front so saturation is still a 429/503
+    slot = None
+    if todo:
+        try:
+            await limiter.acquire()
+        except Saturated as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": "1"})
+        slot = SlotGuard(limiter)
+
+    async def generate(indices):
+        q, context = questions[indices[0]], docs[indices[0]]
+        try:
+            inputs, _ = assembler.assemble(q, context, [])
+            with ollama_pool.lease() as backend:
+                answer = await asyncio.wait_for(make_chain(backend).ainvoke(inputs), ask_timeout)
+        except asyncio.TimeoutError:
+            return result_lines(questions, indices, error="timed out")
+        except Exception as e:
+            logging.getLogger("pokedex.batch").warning("batch generation failed for %r: %s", q, e)
+            return result_lines(questions, indices, error="generation failed")
+        answers_total.inc(source="generated")
+        answer_cache.put(q, context_fingerprint(context), llm_model, answer)
+        return result_lines(questions, indices, answer=answer, source="generated")
+
+    async def stream_results():
+        tasks = []
+        try:
+            for line in replayed:
+                yield line
+            if not todo:
+                return
+
+            jobs, done = iter(todo), asyncio.Queue()
+
+            async def worker():
+                # workers share one iterator, so each job is taken exactly once
+                for indices in jobs:
+                    await done.put(await generate(indices))
+
+            async def extra_worker():
+                if not await limiter.try_acquire():
+                    return
+                try:
+                    await worker()
+                finally:
+                    limiter.release()
+
+            tasks.append(asyncio.create_task(worker()))
+            tasks += [asyncio.create_task(extra_worker()) for _ in range(min(batch_workers, len(todo)) - 1)]
+            for _ in todo:
+                for line in await done.get():
+                    yield line
+        finally:
+            # a disconnect closes this generator; cancel whatever is still generating
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if slot is not None:
+                slot.release()
+
+    return GuardedStreamingResponse(stream_results(), slot=slot, media_type="application/x-ndjson")
+
+
+@app.get("/ready")
+def ready():
+    status = ollama_pool.status()
+    if not status["ready"]:
+        raise HTTPException(status_code=503, detail=status)
+    return status
+
+
+@app.get("/entries/{pokemon_id}")
+def get_entry(pokemon_id: int):
+    record = entry_store.get_record(pokemon_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="No materialized entry for this Pokémon.")
+    return record
+
+
+@app.get("/stats/embeddings")
+def embedding_stats():
+    return embedding_model.stats()
+
+
+@app.get("/stats/answers")
+def answer_stats():
+    return answer_cache.stats()
+
+
+@app.get("/stats/limits")
+def limit_stats():
+    return limiter.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,232 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
+from pydantic import PrivateAttr
+
+from filters import matches
+from indexer import chunking_mode, read_index_version
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _WORD_RE.findall(text.lower())
+
+
+def doc_key(doc):
+    return doc.id or f"{doc.metadata.get('source')}:{doc.metadata.get('chunk', 0)}"
+
+
+class BM25Index:
+    # Okapi BM25 over chunk text plus its string metadata
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = []
+        self.doc_len = []
+        self.avg_len = 0.0
+        self.postings = defaultdict(list)
+        self.idf = {}
+
+    def build(self, docs):
+        self.docs = list(docs)
+        self.doc_len = []
+        self.postings = defaultdict(list)
+        for i, doc in enumerate(self.docs):
+            meta = " ".join(str(v) for v in doc.metadata.values() if isinstance(v, str))
+            counts = Counter(tokenize(doc.page_content + " " + meta))
+            self.doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+        n = len(self.docs)
+        self.avg_len = sum(self.doc_len) / n if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in self.postings.items()
+        }
+        return self
+
+    def search(self, query, k):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[i] / self.avg_len)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [(self.docs[i], score) for i, score in best]
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=60):
+    scores, docs = defaultdict(float), {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc_key(doc)
+            scores[key] += 1.0 / (rrf_k + rank + 1)
+            docs.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    # dense (Chroma) + lexical (BM25) legs fused with reciprocal rank fusion;
+    # the BM25 side is rebuilt from the collection whenever the index version moves
+    vector_store: Any
+    db_dir: Any = None
+    k: int = 4
+    k_dense: int = 8
+    k_lexical: int = 8
+    rrf_k: int = 60
+    _bm25: Any = None
+    _version: Any = None
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def sync(self):
+        version = read_index_version(self.db_dir)
+        if self._bm25 is not None and version == self._version:
+            return self._bm25
+        with self._lock:
+            if self._bm25 is None or version != self._version:
+                data = self.vector_store.get(include=["documents", "metadatas"])
+                docs = [
+                    Document(id=id_, page_content=text, metadata=meta or {})
+                    for id_, text, meta in zip(data["ids"], data["documents"], data["metadatas"])
+                ]
+                self._bm25 = BM25Index().build(docs)
+                self._version = version
+        return self._bm25
+
+    def lexical(self, query, k=None, filter=None):
+        k = k or self.k_lexical
+        bm25 = self.sync()
+        if filter is None:
+            return [doc for doc, _ in bm25.search(query, k)]
+        # no pre-filtering in BM25: over-fetch and keep the matching ones
+        hits = bm25.search(query, len(bm25.docs))
+        return [doc for doc, _ in hits if matches(doc.metadata, filter)][:k]
+
+    def dense(self, query, k=None, filter=None):
+        return self.vector_store.similarity_search(query, k=k or self.k_dense, filter=filter)
+
+    def _get_relevant_documents(self, query, *, run_manager=None, filter=None):
+        return reciprocal_rank_fusion(
+            [self.dense(query, filter=filter), self.lexical(query, filter=filter)], self.k, self.rrf_k
+        )
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None, filter=None):
+        return await run_in_executor(None, self._get_relevant_documents, query, filter=filter)
+
+
+def resolve_parents(docs, cores, k):
+    # child hits -> one document per parent record, in best-hit order: the core chunk
+    # plus only the matched child lines it doesn't already contain
+    order, matched = [], {}
+    for doc in docs:
+        parent = doc.metadata.get("parent")
+        if parent is None:
+            # text-splitter chunks have no parent; prompting merges those by source
+            order.append(doc)
+            continue
+        if parent not in matched:
+            matched[parent] = []
+            order.append(parent)
+        matched[parent].append(doc)
+
+    out = []
+    for item in order:
+        if isinstance(item, Document):
+            out.append(item)
+            continue
+        children = matched[item]
+        core = cores.get(item) or next((d for d in children if d.metadata.get("kind") == "core"), None)
+        if core is None:
+            # core missing (e.g. mid re-index): fall back to the children themselves
+            out.extend(children)
+            continue
+        lines = core.page_content.splitlines()
+        seen_fields = {line.split(":", 1)[0] for line in lines}
+        for child in sorted(children, key=lambda d: d.metadata.get("chunk", 0)):
+            lines.extend(
+                line for line in child.page_content.splitlines()
+                if line.split(":", 1)[0] not in seen_fields
+            )
+        kinds = sorted({d.metadata.get("kind", "") for d in children})
+        out.append(Document(
+            id=core.id,
+            page_content="\n".join(lines),
+            metadata={**core.metadata, "kind": "parent", "matched": ",".join(kinds)}
+        ))
+    return out[:k]
+
+
+class ParentRetriever(BaseRetriever):
+    # CHUNKING=entity: search over small core/ability/move chunks, answer with parents
+    child: Any
+    vector_store: Any
+    k: int = 4
+
+    def cores(self, docs):
+        parents = {d.metadata["parent"] for d in docs if d.metadata.get("parent")}
+        hit = {d.metadata["parent"] for d in docs if d.metadata.get("kind") == "core"}
+        missing = [f"{p}:core" for p in parents - hit]
+        if not missing:
+            return {}
+        data = self.vector_store.get(ids=missing, include=["documents", "metadatas"])
+        return {
+            (meta or {}).get("parent"): Document(id=id_, page_content=text, metadata=meta or {})
+            for id_, text, meta in zip(data["ids"], data["documents"], data["metadatas"])
+        }
+
+    def _get_relevant_documents(self, query, *, run_manager=None, **kwargs):
+        docs = self.child.invoke(query, **kwargs)
+        return resolve_parents(docs, self.cores(docs), self.k)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None, **kwargs):
+        docs = await self.child.ainvoke(query, **kwargs)
+        cores = await run_in_executor(None, self.cores, docs)
+        return resolve_parents(docs, cores, self.k)
+
+
+def build_retriever(vector_store, db_dir, mode=None, k=None):
+    mode = mode or os.getenv("RETRIEVAL_MODE", "similarity")
+    k = k or int(os.getenv("RETRIEVAL_K", 4))
+    if chunking_mode() == "entity":
+        # several children usually hit the same record, so search wider than k
+        return ParentRetriever(
+            child=build_leaf_retriever(vector_store, db_dir, mode, int(os.getenv("RETRIEVAL_K_CHILDREN", 3 * k))),
+            vector_store=vector_store,
+            k=k,
+        )
+    return build_leaf_retriever(vector_store, db_dir, mode, k)
+
+
+def build_leaf_retriever(vector_store, db_dir, mode, k):
+    if mode == "hybrid":
+        return HybridRetriever(
+            vector_store=vector_store,
+            db_dir=db_dir,
+            k=k,
+            k_dense=int(os.getenv("RETRIEVAL_K_DENSE", 2 * k)),
+            k_lexical=int(os.getenv("RETRIEVAL_K_LEXICAL", 2 * k)),
+        )
+    if mode == "similarity":
+        return vector_store.as_retriever(search_type="similarity", search_kwargs={"k": k})
+    if mode == "matrix":
+        # exported by `python main.py matrix` (or db with RETRIEVAL_MODE=matrix)
+        from matrix_index import MatrixRetriever, matrix_dir
+        return MatrixRetriever(
+            embeddings=vector_store.embeddings,
+            directory=matrix_dir(db_dir),
+            db_dir=db_dir,
+            k=k,
+        )
+    raise ValueError(f"unknown RETRIEVAL_MODE: {mode}")
@@ -0,0 +1,108 @@
+import bisect
+import difflib
+import json
+import re
+from typing import Any
+
+from langchain_core.retrievers import BaseRetriever
+
+from indexer import row_to_document
+
+# phrasings the UI and people wrap around a bare species lookup
+FILLER = re.compile(
+    r"^(?:give me (?:full )?pok[eé]dex info(?:rmation)? (?:about|on|for)"
+    r"|(?:tell me|info|information) (?:about|on)"
+    r"|(?:what|who) (?:is|are)"
+    r"|show me|look ?up|compare)\s+"
+)
+SEPARATORS = re.compile(r"\s*(?:,|&|\band\b|\bvs\.?|\bversus\b)\s*")
+DEX_NUMBER = re.compile(r"^(?:#|no\.?\s*|number\s*)?0*(\d+)$")
+
+
+def normalize_name(name):
+    name = name.lower().replace("é", "e")
+    name = re.sub(r"[^a-z0-9]+", " ", name)
+    return " ".join(name.split())
+
+
+class SpeciesIndex:
+    # in-memory name/id index over the Pokemon rows
+    def __init__(self, rows):
+        self.by_id = {int(row["id"]): row for row in rows}
+        self.by_name = {}
+        for pid, row in self.by_id.items():
+            name = normalize_name(row["name"])
+            self.by_name[name] = pid
+            # "mr mime" and "mrmime" both resolve
+            self.by_name.setdefault(name.replace(" ", ""), pid)
+        self.names = sorted(self.by_name)
+        self.abilities = sorted({a for row in rows for a in json.loads(row["abilities"])})
+
+    def _prefix(self, term):
+        i = bisect.bisect_left(self.names, term)
+        hits = set()
+        while i < len(self.names) and self.names[i].startswith(term):
+            hits.add(self.by_name[self.names[i]])
+            i += 1
+        return hits.pop() if len(hits) == 1 else None
+
+    def lookup(self, term):
+        term = term.strip()
+        match = DEX_NUMBER.match(term)
+        if match:
+            pid = int(match.group(1))
+            return pid if pid in self.by_id else None
+
+        name = normalize_name(term)
+        if not name:
+            return None
+        if name in self.by_name:
+            return self.by_name[name]
+        if len(name) >= 4:
+            pid = self._prefix(name)
+            if pid is not None:
+                return pid
+        close = difflib.get_close_matches(name, self.names, n=1, cutoff=0.85)
+        return self.by_name[close[0]] if close else None
+
+    def resolve(self, question):
+        # species ids if the whole question is a list of names/dex numbers, else None
+        q = question.strip().lower().rstrip("?!. ")
+        q = FILLER.sub("", q)
+        parts = [p for p in SEPARATORS.split(q) if p.strip()]
+        if not parts:
+            return None
+        ids = []
+        for part in parts:
+            pid = self.lookup(part)
+            if pid is None:
+                return None
+            if pid not in ids:
+                ids.append(pid)
+        return ids
+
+    def documents(self, ids):
+        docs = []
+        for pid in ids:
+            doc = row_to_document(self.by_id[pid])
+            doc.metadata["routed"] = True
+            docs.append(doc)
+        return docs
+
+
+class RoutedRetriever(BaseRetriever):
+    # exact species lookups skip embedding + ANN search; everything else goes to fallback
+    species_index: Any
+    fallback: Any
+
+    def _get_relevant_documents(self, query, *, run_manager=None, **kwargs):
+        ids = self.species_index.resolve(query) if self.species_index else None
+        if ids:
+            return self.species_index.documents(ids)
+        return self.fallback.invoke(query, **kwargs)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None, **kwargs):
+        ids = self.species_index.resolve(query) if self.species_index else None
+        if ids:
+            return self.species_index.documents(ids)
+        return await self.fallback.ainvoke(query, **kwargs)
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from answer_cache import AnswerCache, context_fingerprint
+from history import MemoryHistoryStore
+
+DOCS = [SimpleNamespace(page_content="Name: Pikachu\nTypes: Electric")]
+FOLLOW_UP = "What does it evolve into?"
+
+
+def two_sessions():
+    store = MemoryHistoryStore()
+    store.append("ash", "Who is Pikachu?", "An Electric-type mouse.")
+    store.append("gary", "Who is Eevee?", "A Normal-type with many evolutions.")
+    return store.get("ash"), store.get("gary")
+
+
+def test_same_question_is_not_replayed_across_sessions():
+    ash, gary = two_sessions()
+    cache = AnswerCache()
+    cache.put(FOLLOW_UP, context_fingerprint(DOCS, ash), "mistral", "Raichu.")
+
+    assert cache.get(FOLLOW_UP, context_fingerprint(DOCS, gary), "mistral") is None
+    assert cache.get(FOLLOW_UP, context_fingerprint(DOCS, ash), "mistral") == "Raichu."
+
+
+def test_semantic_tier_respects_session_history():
+    ash, gary = two_sessions()
+    cache = AnswerCache(semantic_threshold=0.9)
+    cache.put(FOLLOW_UP, context_fingerprint(DOCS, ash), "mistral", "Raichu.", embedding=[1.0, 0.0])
+
+    assert cache.get("What does it evolve to?", context_fingerprint(DOCS, gary), "mistral", [1.0, 0.0]) is None
+    assert cache.get("What does it evolve to?", context_fingerprint(DOCS, ash), "mistral", [1.0, 0.0]) == "Raichu."
+
+
+def test_empty_history_matches_stateless_callers():
+    assert context_fingerprint(DOCS, []) == context_fingerprint(DOCS)
@@ -0,0 +1,9 @@
+import re
+
+# rough word/punctuation split; close enough to BPE counts for budgeting without
+# shipping the model's tokenizer
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    return len(_TOKEN_RE.findall(text or ""))
@@ -0,0 +1,114 @@
+import contextvars
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from metrics import RATE_BUCKETS, REQUEST_ID, Counter, Gauge, Histogram, Registry, Sampler
+
+logger = logging.getLogger("pokedex.trace")
+
+registry = Registry()
+request_ms = registry.add(Histogram("pokedex_request_ms", "Request duration incl. streaming", labels=("route", "status")))
+stage_ms = registry.add(Histogram("pokedex_stage_ms", "Time per /ask stage", labels=("stage",)))
+ttft_ms = registry.add(Histogram("pokedex_ttft_ms", "Time to first generated token"))
+tokens_per_sec = registry.add(Histogram("pokedex_tokens_per_sec", "Generation speed", RATE_BUCKETS))
+answers_total = registry.add(Counter("pokedex_answers_total", "/ask answers by source", labels=("source",)))
+
+
+class Trace:
+    # per-request timings; one structured log line when the response is done
+    def __init__(self, request_id, route):
+        self.request_id = request_id
+        self.route = route
+        self.began = time.perf_counter()
+        self.spans = []
+        self.attrs = {}
+
+    def finish(self, status):
+        total = (time.perf_counter() - self.began) * 1000
+        request_ms.observe(total, route=self.route, status=status)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "request_id": self.request_id,
+                "route": self.route,
+                "status": status,
+                "total_ms": round(total, 2),
+                "spans": [{"stage": n, "ms": round(ms, 2)} for n, ms in self.spans],
+                **self.attrs,
+            }))
+
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def current_request_id():
+    trace = current_trace.get()
+    return trace.request_id if trace else None
+
+
+@contextmanager
+def span(stage):
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - began) * 1000
+        stage_ms.observe(ms, stage=stage)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.spans.append((stage, ms))
+
+
+def annotate(**attrs):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+class TracingMiddleware:
+    # pure ASGI so the span covers the whole streamed body, not just the headers;
+    # PROFILE_DIR enables per-request profiling for requests sent with X-Profile: 1
+    def __init__(self, app):
+        self.app = app
+        self.profile_dir = os.getenv("PROFILE_DIR")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        # an incoming id (e.g. from the Flask app) is kept if it is safe to log and use as a filename
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        if not REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        trace = Trace(request_id, scope["path"])
+        token = current_trace.set(trace)
+        sampler = None
+        if self.profile_dir and headers.get(b"x-profile") == b"1":
+            # every request shares the event loop, so this is a process-wide profile
+            # taken while the request runs: all threads (loop + threadpool) are sampled
+            # and other in-flight requests show up too; profile an idle server for a
+            # clean single-request picture
+            sampler = Sampler().start()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            current_trace.reset(token)
+            # route template, not the raw path, keeps label cardinality bounded
+            trace.route = getattr(scope.get("route"), "path", "unmatched")
+            trace.finish(status)
+            if sampler is not None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                sampler.stop(os.path.join(self.profile_dir, f"{request_id}.folded"))
@@ -1,32 +1,145 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from poke_app import create_app
-from poke_app.models import Pokemon
+from poke_app.config import Config
+from poke_app.models import Pokemon, PokemonType
 from poke_app.extensions import db
 
 app = create_app()
 
-def fetch_and_store_pokemon():
+LAST_ID = 386
+
+
+def make_session(workers):
+    # pooled keep-alive connections, retries with exponential backoff on 429/5xx
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def fetch_one(session, pokemon_id):
+    res = session.get(f"{Config.POKEAPI_BASE_URL}/pokemon/{pokemon_id}", timeout=Config.POKEAPI_TIMEOUT)
+    if res.status_code == 404:
+        return None
+    res.raise_for_status()
+    data = res.json()
+    return {
+        'id': data['id'],
+        'name': data['name'].capitalize(),
+        'sprite': data['sprites']['front_default'],
+        'height': data['height'],
+        'weight': data['weight'],
+        'types': ', '.join([t['type']['name'].capitalize() for t in data['types']]),
+        'abilities': ', '.join([a['ability']['name'] for a in data['abilities']]),
+        'updated_at': datetime.utcnow(),
+    }
+
+
+def pending_ids(ids, max_age, force=False):
+    # the table itself is the checkpoint: anything already stored and fresh is skipped
+    if force:
+        return list(ids)
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+    done = {
+        pid for (pid,) in db.session.query(Pokemon.id)
+        .filter(Pokemon.id.in_(list(ids)), Pokemon.updated_at >= cutoff)
+    }
+    return [i for i in ids if i not in done]
+
+
+def upsert(rows):
+    if not rows:
+        return
+    table = Pokemon.__table__
+    dialect = db.engine.dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in rows[0] if c != 'id'})
+        db.session.execute(stmt)
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['id'],
+            set_={c: stmt.excluded[c] for c in rows[0] if c != 'id'}
+        )
+        db.session.execute(stmt)
+    else:
+        for row in rows:
+            db.session.merge(Pokemon(**row))
+    replace_types(rows)
+    db.session.commit()
+
+
+def replace_types(rows):
+    # keep the normalized pokemon_type table in step with Pokemon.types
+    ids = [row['id'] for row in rows]
+    PokemonType.query.filter(PokemonType.pokemon_id.in_(ids)).delete(synchronize_session=False)
+    type_rows = [
+        {'pokemon_id': row['id'], 'type': t.strip()}
+        for row in rows for t in (row['types'] or '').split(',') if t.strip()
+    ]
+    if type_rows:
+        db.session.execute(PokemonType.__table__.insert(), type_rows)
+
+
+def fetch_and_store_pokemon(start=1, end=LAST_ID, workers=16, batch_size=100, max_age=7 * 24 * 3600, force=False):
     with app.app_context():
-        db.drop_all()     # WARNING: removes all data – use with caution
         db.create_all()
+        ids = pending_ids(range(start, end + 1), max_age, force)
+        print(f"{end - start + 1 - len(ids)} Pokémon up to date, fetching {len(ids)}.")
+
+        began = time.perf_counter()
+        session = make_session(workers)
+        batch, stored, failed = [], 0, []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(fetch_one, session, i): i for i in ids}
+            for future in as_completed(futures):
+                try:
+                    row = future.result()
+                except requests.RequestException as e:
+                    failed.append(futures[future])
+                    print(f"#{futures[future]} failed: {e}")
+                    continue
+                if row is None:
+                    continue
+                batch.append(row)
+                # commit in batches so a crash only loses the current batch
+                if len(batch) >= batch_size:
+                    upsert(batch)
+                    stored += len(batch)
+                    batch = []
+        upsert(batch)
+        stored += len(batch)
+
+        print(f"{stored} Pokémon stored in {time.perf_counter() - began:.1f}s.")
+        if failed:
+            print(f"{len(failed)} failed, re-run to retry: {sorted(failed)}")
 
-        for id in range(1, 387):
-            res = requests.get(f"https://pokeapi.co/api/v2/pokemon/{id}")
-            if res.status_code == 200:
-                data = res.json()
-                pkmn = Pokemon(
-                    id=data['id'],
-                    name=data['name'].capitalize(),
-                    sprite=data['sprites']['front_default'],
-                    height=data['height'],
-                    weight=data['weight'],
-                    types=', '.join([t['type']['name'].capitalize() for t in data['types']]),
-                    abilities=', '.join([a['ability']['name'] for a in data['abilities']])
-                )
-                db.session.add(pkmn)
-        
-        db.session.commit()
-        print("All Pokémon scraped and stored.")
 
 if __name__ == "__main__":
-    fetch_and_store_pokemon()
+    parser = argparse.ArgumentParser(description="Ingest Pokémon from PokéAPI into the Pokemon table.")
+    parser.add_argument("--start", type=int, default=1)
+    parser.add_argument("--end", type=int, default=LAST_ID)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-age", type=int, default=7 * 24 * 3600, help="Seconds before a stored row is re-fetched.")
+    parser.add_argument("--force", action="store_true", help="Re-fetch every id regardless of the checkpoint.")
+    args = parser.parse_args()
+    fetch_and_store_pokemon(args.start, args.end, args.workers, args.batch_size, args.max_age, args.force)